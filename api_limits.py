@@ -0,0 +1,138 @@
+# api_limits.py — ліміти частоти запитів до API і скидання навантаження
+"""
+check(route, user_id, ip) викликається PointsAPI перед обробкою запиту.
+
+Ліміти (token bucket, rate_limit.KeyedRateLimiter):
+- окремо на (user_id, маршрут) і на (IP, маршрут), бюджет маршруту —
+  ROUTE_LIMITS; user_id клієнт передає сам, тож IP-ліміт — страховка
+  від підробленого user_id (бюджет IP ширший: за одним NAT багато людей)
+- невідомі маршрути ділять один бюджет "*"
+- перевищення -> 429 + Retry-After
+
+Скидання навантаження (db_pool.recent_wait(): очікування вільного
+з'єднання в пулі, а без пулу — час відкриття нового з'єднання):
+- очікування з'єднання > SHED_LOW_WAIT_MS -> 503 для фонових читань (LOW)
+- > SHED_NORMAL_WAIT_MS -> 503 і для звичайних (NORMAL)
+- мутації (HIGH) не скидаються ніколи
+
+Адмінські маршрути, / і /metrics не обмежуються.
+"""
+
+import db_pool
+import metrics
+from config import (
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_PROXY_HOPS,
+    SHED_LOW_WAIT_MS,
+    SHED_NORMAL_WAIT_MS,
+)
+from rate_limit import KeyedRateLimiter
+
+ENABLED = RATE_LIMIT_ENABLED
+
+# (запитів/сек, burst) на одного користувача
+DEFAULT_LIMIT = (10, 20)
+ROUTE_LIMITS = {
+    "/api/add_points": (5, 10),
+    "/api/ensure_user": (1, 5),
+    "/api/join_giveaway": (2, 5),
+    "/api/join_tournament": (1, 5),
+    "/api/submit_move": (5, 10),
+    "/api/submit_moves": (2, 5),
+    "/api/one_vs_one/join": (1, 5),
+    "/api/one_vs_one/move": (5, 10),
+    "/api/one_vs_one/state": (2, 6),
+    "/api/get_points": (5, 10),
+    "/api/get_giveaways": (2, 10),
+    "/api/get_joined_giveaways": (2, 10),
+    "/api/get_tournaments": (2, 10),
+    "/api/get_tournament": (2, 10),
+    "/api/get_next_match": (2, 6),
+    "/api/get_my_matches": (2, 6),
+}
+# бюджет IP = бюджет користувача * IP_BUDGET_FACTOR
+IP_BUDGET_FACTOR = 20
+
+HIGH, NORMAL, LOW = "high", "normal", "low"
+ROUTE_PRIORITY = {
+    "/api/add_points": HIGH,
+    "/api/ensure_user": HIGH,
+    "/api/join_giveaway": HIGH,
+    "/api/join_tournament": HIGH,
+    "/api/submit_move": HIGH,
+    "/api/submit_moves": HIGH,
+    "/api/one_vs_one/join": HIGH,
+    "/api/one_vs_one/move": HIGH,
+    # те, що WebApp опитує в циклі або може показати з кешу
+    "/api/one_vs_one/state": LOW,
+    "/api/get_giveaways": LOW,
+    "/api/get_joined_giveaways": LOW,
+    "/api/get_tournaments": LOW,
+    "/api/get_tournament": LOW,
+    "/api/get_my_matches": LOW,
+}
+SHED_WAIT_SEC = {
+    LOW: SHED_LOW_WAIT_MS / 1000,
+    NORMAL: SHED_NORMAL_WAIT_MS / 1000,
+}
+SHED_RETRY_AFTER_SEC = 1.0
+
+EXEMPT_ROUTES = {"/", "/metrics"}
+EXEMPT_PREFIX = "/api/admin/"
+
+_users = KeyedRateLimiter()
+_ips = KeyedRateLimiter()
+
+REJECTED = metrics.Counter(
+    "http_rejected_total", "Requests rejected by rate limit or load shedding", ("route", "reason"),
+)
+metrics.Gauge(
+    "rate_limiter_keys",
+    "Keys tracked by API rate limiters",
+    lambda: {("user",): len(_users), ("ip",): len(_ips)},
+    ("scope",),
+)
+
+
+def client_ip(headers, client_address) -> str:
+    """
+    IP клієнта: RATE_LIMIT_PROXY_HOPS-й з кінця в X-Forwarded-For
+    (ліві записи клієнт може підставити сам), інакше адреса з'єднання.
+    """
+    forwarded = headers.get("X-Forwarded-For") if RATE_LIMIT_PROXY_HOPS > 0 else None
+    if forwarded:
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if len(hops) >= RATE_LIMIT_PROXY_HOPS:
+            return hops[-RATE_LIMIT_PROXY_HOPS]
+    return client_address[0]
+
+
+def check(route: str, user_id: int | None, ip: str) -> tuple[int, float] | None:
+    """
+    None — запит пропускаємо; інакше (HTTP-статус, Retry-After у секундах).
+    """
+    if not ENABLED or route in EXEMPT_ROUTES or route.startswith(EXEMPT_PREFIX):
+        return None
+
+    limit = ROUTE_LIMITS.get(route)
+    bucket = route if limit is not None else "*"
+    rate, burst = limit or DEFAULT_LIMIT
+
+    # спершу скидання: дешево і не витрачає токени
+    priority = ROUTE_PRIORITY.get(route, NORMAL)
+    if priority != HIGH and db_pool.recent_wait() > SHED_WAIT_SEC[priority]:
+        REJECTED.inc(bucket, "overloaded")
+        return 503, SHED_RETRY_AFTER_SEC
+
+    if user_id:
+        retry_after = _users.try_acquire((user_id, bucket), rate, burst)
+        if retry_after:
+            REJECTED.inc(bucket, "user_rate")
+            return 429, retry_after
+
+    retry_after = _ips.try_acquire((ip, bucket), rate * IP_BUDGET_FACTOR, burst * IP_BUDGET_FACTOR)
+    if retry_after:
+        REJECTED.inc(bucket, "ip_rate")
+        return 429, retry_after
+
+    return None
@@ -1,15 +1,28 @@
 # api_server.py — HTTP API для DreamX (points, giveaways, tournaments, 1vs1)
 
+import hmac
+import io
 import logging
 import json
+import math
 import os
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import urlparse, parse_qs
 
+import api_limits
 import bd
 import giveaway_db_from_admin as gdb
+import giveaway_join_queue as gjoin
+import channel_membership
+import db_stats
+import metrics
+import profiling
 import tournaments_client_db as tdb
 import tournaments_game_db as tgame  # <--- ДОДАНО
+import tournaments_scheduler as tsched
+from config import ADMIN_API_TOKEN
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -18,14 +31,173 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# максимальний розмір сторінки стрічки карточок (?limit=)
+CARDS_PAGE_MAX = 100
+# як часто звіряти лічильники учасників розіграшів з giveaway_players
+COUNTERS_RECONCILE_SEC = 600
+# як часто чистити старі "надгробки" видалених карточок
+TOMBSTONES_PURGE_SEC = 24 * 3600
+# як часто чистити прострочені ключі ідемпотентності
+IDEMPOTENCY_PURGE_SEC = 3600
+# максимальний розмір тіла POST-запиту
+MAX_BODY_BYTES = 64 * 1024
+
+# методи і шляхи, які ми обробляємо; решта в метриках — "other"
+HTTP_METHODS = frozenset({"GET", "POST", "HEAD", "OPTIONS"})
+ROUTES = frozenset({
+    "/",
+    "/metrics",
+    "/api/get_points",
+    "/api/get_giveaways",
+    "/api/get_joined_giveaways",
+    "/api/get_tournaments",
+    "/api/get_tournament",
+    "/api/get_next_match",
+    "/api/get_my_matches",
+    "/api/admin/export_participants",
+    "/api/admin/profile",
+    "/api/admin/tracemalloc",
+    "/api/admin/db_stats",
+    "/api/one_vs_one/state",
+    "/api/add_points",
+    "/api/ensure_user",
+    "/api/join_giveaway",
+    "/api/join_tournament",
+    "/api/submit_move",
+    "/api/submit_moves",
+    "/api/one_vs_one/join",
+    "/api/one_vs_one/move",
+})
+
+
+class _ChunkedWriter:
+    """
+    file-like обгортка над wfile для chunked-відповіді. copy_expert пише
+    по рядку CSV за раз, тож дані накопичуються в буфері і йдуть
+    HTTP chunk-ами по CHUNK_SIZE байт; close() дописує залишок і кінець.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self._buf = bytearray()
+
+    def _flush_chunk(self):
+        if self._buf:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(self._buf), self._buf))
+            self._buf.clear()
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._buf += data
+        if len(self._buf) >= self.CHUNK_SIZE:
+            self._flush_chunk()
+        return len(data)
+
+    def close(self):
+        self._flush_chunk()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def _one_vs_one_rooms() -> dict:
+    from one_vs_one_logic import get_room_counts
+    return {(status,): count for status, count in get_room_counts().items()}
+
+
+metrics.Gauge(
+    "one_vs_one_rooms",
+    "1v1 rooms by status (waiting = players in the matchmaking queue)",
+    _one_vs_one_rooms,
+    ("status",),
+)
+
 
 class PointsAPI(BaseHTTPRequestHandler):
 
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def handle_one_request(self):
+        # латентність і статус кожного запиту для /metrics
+        self._status = None
+        started = time.perf_counter()
+
+        # поки йде /api/admin/profile?mode=cprofile — профілюємо кожен запит
+        profile = profiling.request_profiler()
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+: інший профайлер уже активний — обробляємо без профілю
+                profiling.request_skipped(profile)
+                profile = None
+        if profile is None:
+            super().handle_one_request()
+        else:
+            try:
+                super().handle_one_request()
+            finally:
+                profile.disable()
+                profiling.request_finished(profile)
+
+        if self._status is None:
+            return
+
+        # невідомі шляхи — одна мітка, щоб сканери не роздували метрики
+        # (OPTIONS / HEAD і 429 / 503 відповідають на будь-який шлях);
+        # якщо рядок запиту не розібрався (400 / 414), self.path немає
+        route = urlparse(getattr(self, "path", "")).path
+        if route not in ROUTES:
+            route = "other"
+        method = self.command if self.command in HTTP_METHODS else "other"
+        metrics.HTTP_REQUESTS.inc(method, route, str(self._status))
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, method, route)
+
     def _set_cors(self):
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Headers", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
 
+    def _is_admin(self) -> bool:
+        token = self.headers.get("X-Admin-Token") or ""
+        if not token:
+            # Prometheus передає токен як bearer
+            auth = self.headers.get("Authorization") or ""
+            if auth.startswith("Bearer "):
+                token = auth[len("Bearer "):]
+        return bool(ADMIN_API_TOKEN) and hmac.compare_digest(token, ADMIN_API_TOKEN)
+
+    def _rejected(self, path: str, user_id) -> bool:
+        """
+        Ліміти частоти / скидання навантаження (api_limits). True — відповідь
+        (429 або 503) уже надіслана.
+        """
+        try:
+            user_id = int(user_id) if user_id is not None else None
+        except (TypeError, ValueError):
+            user_id = None
+
+        rejected = api_limits.check(
+            path, user_id, api_limits.client_ip(self.headers, self.client_address)
+        )
+        if rejected is None:
+            return False
+
+        status, retry_after = rejected
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Retry-After", str(max(1, int(retry_after + 0.999))))
+        self._set_cors()
+        self.end_headers()
+        if status == 429:
+            self.wfile.write(b'{"error":"rate_limited"}')
+        else:
+            self.wfile.write(b'{"error":"overloaded"}')
+        return True
+
     def do_HEAD(self):
         self.send_response(200)
         self.send_header("Content-Type", "text/plain")
@@ -42,6 +214,9 @@ class PointsAPI(BaseHTTPRequestHandler):
         path = parsed.path
         params = parse_qs(parsed.query)
 
+        if self._rejected(path, params.get("user_id", [None])[0]):
+            return
+
         # health-check
         if path == "/":
             self.send_response(200)
@@ -78,10 +253,74 @@ class PointsAPI(BaseHTTPRequestHandler):
 
         # =============== GET_GIVEAWAYS ==================
         if path == "/api/get_giveaways":
+            # ?since=<cursor> — лише зміни з попереднього запиту
+            since_raw = params.get("since", [None])[0]
+            try:
+                since = float(since_raw) if since_raw else None
+                if since is not None and not math.isfinite(since):
+                    raise ValueError("bad_since")
+            except ValueError:
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"bad_since"}')
+                return
+
+            # ?kind=normal,promo&fields=id,title&limit=20&cursor=...
+            kinds_raw = params.get("kind", [None])[0]
+            fields_raw = params.get("fields", [None])[0]
+            limit_raw = params.get("limit", [None])[0]
+            cursor = params.get("cursor", [None])[0]
+            paged = any(x is not None for x in (kinds_raw, fields_raw, limit_raw, cursor))
+
+            try:
+                # без повторів (?kind=normal,normal), порядок зберігаємо
+                kinds = list(dict.fromkeys(k for k in kinds_raw.split(",") if k)) if kinds_raw else None
+                fields = {f for f in fields_raw.split(",") if f} if fields_raw else None
+                limit = min(int(limit_raw), CARDS_PAGE_MAX) if limit_raw else None
+                if limit is not None and limit <= 0:
+                    raise ValueError("bad_limit")
+                if kinds and any(k not in gdb.CARD_KINDS for k in kinds):
+                    raise ValueError("bad_kind")
+                if cursor:
+                    gdb.decode_cards_cursor(cursor)
+                # дельта віддається цілою: kind і fields працюють, сторінок немає
+                if since_raw is not None and (limit is not None or cursor):
+                    raise ValueError("since_with_paging")
+            except ValueError:
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"bad_parameters"}')
+                return
+
             try:
-                cards = gdb.get_active_cards()
+                if since_raw is None and paged:
+                    page = gdb.get_cards_page(
+                        kinds=kinds,
+                        fields=fields,
+                        limit=limit,
+                        cursor=cursor,
+                    )
+                    body = {
+                        "giveaways": page["cards"],
+                        "next_cursor": page["next_cursor"],
+                    }
+                elif since_raw is None:
+                    body = {"giveaways": gdb.get_active_cards()}
+                else:
+                    delta = gdb.get_feed_delta(since, kinds=kinds, fields=fields)
+                    body = {
+                        "giveaways": delta["cards"],
+                        "removed": delta["removed"],
+                        "full": delta["full"],
+                        "cursor": f"{delta['cursor']:.6f}",
+                    }
+
                 payload = json.dumps(
-                    {"giveaways": cards},
+                    body,
                     default=str
                 ).encode("utf-8")
 
@@ -232,9 +471,10 @@ class PointsAPI(BaseHTTPRequestHandler):
                 return
 
             try:
-                match = tgame.get_next_match_for_player(tournament_id, user_id)
+                schedule = tgame.get_pending_matches_for_player(tournament_id, user_id)
+                match = schedule[0] if schedule else None
                 payload = json.dumps(
-                    {"match": match},
+                    {"match": match, "schedule": schedule},
                     default=str
                 ).encode("utf-8")
 
@@ -253,6 +493,201 @@ class PointsAPI(BaseHTTPRequestHandler):
                 self.wfile.write(b'{"error":"db_error"}')
                 return
 
+        # =============== GET_MY_MATCHES (турнір) ==================
+        if path == "/api/get_my_matches":
+            try:
+                tournament_id = int(params.get("tournament_id", [0])[0])
+                user_id = int(params.get("user_id", [0])[0])
+            except (TypeError, ValueError):
+                tournament_id = 0
+                user_id = 0
+
+            if not tournament_id or not user_id:
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"bad_parameters"}')
+                return
+
+            try:
+                matches = tgame.get_pending_matches_for_player(tournament_id, user_id)
+                payload = json.dumps(
+                    {"matches": matches},
+                    default=str
+                ).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            except Exception as e:
+                logger.exception("get_my_matches error: %s", e)
+                self.send_response(500)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"db_error"}')
+                return
+
+        # =============== ADMIN: EXPORT_PARTICIPANTS (CSV) ==================
+        if path == "/api/admin/export_participants":
+            if not self._is_admin():
+                self.send_response(403)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"forbidden"}')
+                return
+
+            kind = params.get("kind", ["normal"])[0]
+            try:
+                giveaway_id = int(params.get("giveaway_id", [0])[0])
+            except (TypeError, ValueError):
+                giveaway_id = 0
+
+            if not giveaway_id or kind not in ("normal", "promo"):
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"bad_parameters"}')
+                return
+
+            # chunked потребує HTTP/1.1; після відповіді закриваємо з'єднання
+            self.protocol_version = "HTTP/1.1"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header(
+                "Content-Disposition",
+                f'attachment; filename="participants_{kind}_{giveaway_id}.csv"',
+            )
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("Connection", "close")
+            self._set_cors()
+            self.end_headers()
+
+            out = _ChunkedWriter(self.wfile)
+            try:
+                gdb.export_giveaway_participants_csv(kind, giveaway_id, out)
+                out.close()
+            except Exception as e:
+                # заголовки вже пішли — обриваємо потік без завершального chunk
+                logger.exception("export_participants error: %s", e)
+            return
+
+        # =============== METRICS (Prometheus) ==================
+        if path == "/metrics":
+            if not self._is_admin():
+                self.send_response(403)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"forbidden"}')
+                return
+
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", metrics.CONTENT_TYPE)
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        # =============== ADMIN: PROFILE (CPU) ==================
+        # ?seconds=10&mode=cprofile|sample&sort=cumulative|tottime|ncalls&limit=50
+        if path == "/api/admin/profile" and profiling.ENABLED:
+            if not self._is_admin():
+                self.send_response(403)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"forbidden"}')
+                return
+
+            try:
+                report = profiling.capture(
+                    seconds=float(params.get("seconds", ["10"])[0]),
+                    mode=params.get("mode", ["cprofile"])[0],
+                    sort=params.get("sort", ["cumulative"])[0],
+                    limit=int(params.get("limit", ["50"])[0]),
+                )
+            except profiling.ProfilerBusy:
+                self.send_response(409)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"profiler_busy"}')
+                return
+            except ValueError as e:
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self._set_cors()
+            self.end_headers()
+            self.wfile.write(report.encode("utf-8"))
+            return
+
+        # =============== ADMIN: TRACEMALLOC ==================
+        # ?action=start|diff|stop&limit=30
+        if path == "/api/admin/tracemalloc" and profiling.ENABLED:
+            if not self._is_admin():
+                self.send_response(403)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"forbidden"}')
+                return
+
+            try:
+                report = profiling.tracemalloc_action(
+                    params.get("action", ["diff"])[0],
+                    limit=int(params.get("limit", ["30"])[0]),
+                )
+            except ValueError as e:
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self._set_cors()
+            self.end_headers()
+            self.wfile.write(report.encode("utf-8"))
+            return
+
+        # =============== ADMIN: DB_STATS ==================
+        if path == "/api/admin/db_stats":
+            if not self._is_admin():
+                self.send_response(403)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"forbidden"}')
+                return
+
+            body = json.dumps({
+                "enabled": db_stats.ENABLED,
+                "slow_ms": db_stats.SLOW_SEC * 1000,
+                "queries": db_stats.snapshot(),
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self._set_cors()
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
         # =============== 1VS1: STATE ==================
         if path == "/api/one_vs_one/state":
             try:
@@ -300,6 +735,38 @@ class PointsAPI(BaseHTTPRequestHandler):
     def do_POST(self):
         parsed = urlparse(self.path)
 
+        # тіло читаємо один раз, щоб узяти user_id для лімітів; маршрути
+        # нижче читають його з self.rfile, як і раніше
+        try:
+            length = int(self.headers.get("Content-Length", 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.send_response(400)
+            self.send_header("Content-Type", "application/json")
+            self._set_cors()
+            self.end_headers()
+            self.wfile.write(b'{"error":"bad_content_length"}')
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.send_response(413)
+            self.send_header("Content-Type", "application/json")
+            self._set_cors()
+            self.end_headers()
+            self.wfile.write(b'{"error":"body_too_large"}')
+            return
+
+        raw_body = self.rfile.read(length)
+        self.rfile = io.BytesIO(raw_body)
+        try:
+            body_user_id = json.loads(raw_body.decode("utf-8")).get("user_id")
+        except (ValueError, AttributeError):
+            body_user_id = None
+        if self._rejected(parsed.path, body_user_id):
+            return
+
         # =============== ADD_POINTS ==================
         if parsed.path == "/api/add_points":
             length = int(self.headers.get("Content-Length", 0))
@@ -326,12 +793,39 @@ class PointsAPI(BaseHTTPRequestHandler):
                 self.wfile.write(b'{"error":"bad_parameters"}')
                 return
 
-            new_points = bd.add_points_and_return(user_id, delta)
+            # повтор після таймауту з тим самим ключем не нараховує вдруге
+            idempotency_key = self.headers.get("Idempotency-Key") or payload.get("idempotency_key")
+            if idempotency_key is not None and (
+                not isinstance(idempotency_key, str)
+                or not 0 < len(idempotency_key) <= bd.IDEMPOTENCY_KEY_MAX_LEN
+            ):
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"bad_idempotency_key"}')
+                return
+
+            replayed = False
+            if idempotency_key is None:
+                new_points = bd.add_points_and_return(user_id, delta)
+            else:
+                try:
+                    new_points, replayed = bd.add_points_idempotent(user_id, delta, idempotency_key)
+                except bd.IdempotencyConflict:
+                    self.send_response(409)
+                    self.send_header("Content-Type", "application/json")
+                    self._set_cors()
+                    self.end_headers()
+                    self.wfile.write(b'{"error":"idempotency_key_reused"}')
+                    return
 
             result = json.dumps({"ok": True, "points": new_points}).encode("utf-8")
 
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
+            if replayed:
+                self.send_header("Idempotent-Replayed", "true")
             self._set_cors()
             self.end_headers()
             self.wfile.write(result)
@@ -408,7 +902,24 @@ class PointsAPI(BaseHTTPRequestHandler):
                 return
 
             try:
-                gdb.add_giveaway_player(
+                # promo: спершу перевіряємо підписку на канали
+                if kind == "promo":
+                    missing = channel_membership.get_verifier().missing_channels(
+                        giveaway_id, user_id
+                    )
+                    if missing:
+                        result = json.dumps(
+                            {"error": "not_subscribed", "channels": missing}
+                        ).encode("utf-8")
+
+                        self.send_response(403)
+                        self.send_header("Content-Type", "application/json")
+                        self._set_cors()
+                        self.end_headers()
+                        self.wfile.write(result)
+                        return
+
+                joined = gjoin.get_join_queue().join(
                     giveaway_id=giveaway_id,
                     user_id=user_id,
                     username_snapshot=username,
@@ -416,7 +927,9 @@ class PointsAPI(BaseHTTPRequestHandler):
                     kind=kind,
                 )
 
-                result = json.dumps({"ok": True}).encode("utf-8")
+                result = json.dumps(
+                    {"ok": True, "joined": joined, "already_joined": not joined}
+                ).encode("utf-8")
 
                 self.send_response(200)
                 self.send_header("Content-Type", "application/json")
@@ -425,6 +938,34 @@ class PointsAPI(BaseHTTPRequestHandler):
                 self.wfile.write(result)
                 return
 
+            except channel_membership.MembershipCheckUnavailable as e:
+                logger.warning("join_giveaway membership check unavailable: %s", e)
+                self.send_response(503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Retry-After", str(max(1, int(e.retry_after + 0.999))))
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"membership_check_busy"}')
+                return
+
+            except gjoin.JoinQueueFull:
+                logger.warning("join_giveaway queue is full")
+                self.send_response(503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Retry-After", "1")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"busy"}')
+                return
+
+            except ValueError:
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"bad_kind"}')
+                return
+
             except Exception as e:
                 logger.exception("join_giveaway error: %s", e)
                 self.send_response(500)
@@ -523,6 +1064,8 @@ class PointsAPI(BaseHTTPRequestHandler):
 
             try:
                 result = tgame.submit_move(tournament_id, match_id, user_id, move)
+                if result.get("status") == "finished":
+                    tsched.notify_match_finished(result.get("round_id"))
                 payload = json.dumps(
                     {"ok": True, "result": result},
                     default=str
@@ -554,6 +1097,76 @@ class PointsAPI(BaseHTTPRequestHandler):
                 self.wfile.write(b'{"error":"db_error"}')
                 return
 
+        # =============== SUBMIT_MOVES (пачка ходів) ==================
+        if parsed.path == "/api/submit_moves":
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+
+            try:
+                payload = json.loads(body.decode("utf-8"))
+            except json.JSONDecodeError:
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"invalid_json"}')
+                return
+
+            try:
+                tournament_id = int(payload.get("tournament_id", 0))
+                user_id = int(payload.get("user_id", 0))
+                moves = [
+                    {
+                        "match_id": int(item.get("match_id", 0)),
+                        "move": str(item.get("move", "")).lower(),
+                    }
+                    for item in payload.get("moves") or []
+                ]
+            except Exception:
+                tournament_id = 0
+                user_id = 0
+                moves = []
+
+            if (
+                not tournament_id
+                or not user_id
+                or not moves
+                or any(not m["match_id"] or not m["move"] for m in moves)
+            ):
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"bad_parameters"}')
+                return
+
+            try:
+                results = tgame.submit_moves(tournament_id, user_id, moves)
+                for item in results:
+                    if item["ok"] and item["result"].get("status") == "finished":
+                        tsched.notify_match_finished(item["result"].get("round_id"))
+
+                payload = json.dumps(
+                    {"ok": True, "results": results},
+                    default=str
+                ).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            except Exception as e:
+                logger.exception("submit_moves error: %s", e)
+                self.send_response(500)
+                self.send_header("Content-Type", "application/json")
+                self._set_cors()
+                self.end_headers()
+                self.wfile.write(b'{"error":"db_error"}')
+                return
+
         # =============== 1VS1: JOIN ==================
         if parsed.path == "/api/one_vs_one/join":
             length = int(self.headers.get("Content-Length", 0))
@@ -658,13 +1271,60 @@ class PointsAPI(BaseHTTPRequestHandler):
         self.end_headers()
 
 
+def start_periodic(name: str, fn, interval_sec: float) -> threading.Thread:
+    """
+    Фоновий потік: викликає fn() одразу і далі кожні interval_sec.
+    """
+    def loop():
+        while True:
+            try:
+                fn()
+            except Exception as e:
+                logger.exception("%s error: %s", name, e)
+            time.sleep(interval_sec)
+
+    t = threading.Thread(target=loop, name=name, daemon=True)
+    t.start()
+    return t
+
+
+def init_tables() -> None:
+    bd.init_pg_db()
+    tgame.init_tournament_game_tables()
+    gdb.init_giveaway_tables()
+
+
+def start_background_jobs() -> None:
+    tsched.start_scheduler()
+    start_periodic(
+        "participant-counters",
+        gdb.reconcile_participant_counters,
+        COUNTERS_RECONCILE_SEC,
+    )
+    start_periodic(
+        "card-tombstones",
+        gdb.purge_card_tombstones,
+        TOMBSTONES_PURGE_SEC,
+    )
+    start_periodic(
+        "idempotency-keys",
+        bd.purge_idempotency_keys,
+        IDEMPOTENCY_PURGE_SEC,
+    )
+
+
+def api_port() -> int:
+    return int(os.environ.get("PORT", 8080))
+
+
 def run_api():
-    port = int(os.environ.get("PORT", 8080))
-    server = HTTPServer(("0.0.0.0", port), PointsAPI)
+    port = api_port()
+    server = ThreadingHTTPServer(("0.0.0.0", port), PointsAPI)
     print(f"API server running on port {port}...")
     server.serve_forever()
 
 
 if __name__ == "__main__":
-    bd.init_pg_db()
+    init_tables()
+    start_background_jobs()
     run_api()
@@ -1,10 +1,53 @@
 # bd.py
 
-import psycopg2
-from config import DATABASE_URL
+import hashlib
+
+import db_pool
+from cache import LRUCache
+
+POINTS_CACHE_SIZE = 100_000
+POINTS_CACHE_TTL_SEC = 60
+
+# Кеш балансів. Вмикається лише там, де всі зміни points проходять через
+# цей процес (спільний runtime бота й API), інакше кеш міг би відставати.
+_points_cache: LRUCache | None = None
+
+# Ключі ідемпотентності /api/add_points: скільки годин пам'ятаємо результат
+IDEMPOTENCY_TTL_HOURS = 24
+IDEMPOTENCY_KEY_MAX_LEN = 128
+
+PROFILE_CACHE_SIZE = 50_000
+PROFILE_CACHE_TTL_SEC = 30
+
+# Профілі для бота (/start, /mypoints): user_id -> (user_name, first_name, points).
+# Бали оновлюються write-through функціями нижче.
+_profiles = LRUCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL_SEC, name="profiles")
+
+
+def enable_points_cache() -> LRUCache:
+    global _points_cache
+    if _points_cache is None:
+        _points_cache = LRUCache(maxsize=POINTS_CACHE_SIZE, ttl=POINTS_CACHE_TTL_SEC, name="points")
+    return _points_cache
+
+
+def _cache_points(user_id: int, points: int) -> None:
+    if _points_cache is not None:
+        _points_cache.set(user_id, points)
+    _profiles.update(user_id, lambda p: (p[0], p[1], points))
+
+
+def forget_profiles(user_ids) -> None:
+    """
+    Скидає закешовані профілі (напр. після позначки is_blocked),
+    щоб наступний /start знову зробив upsert.
+    """
+    for user_id in user_ids:
+        _profiles.pop(user_id)
+
 
 def get_connection():
-    return psycopg2.connect(DATABASE_URL, sslmode="require")
+    return db_pool.connect()
 
 
 def init_pg_db():
@@ -34,6 +77,26 @@ def init_pg_db():
                 ALTER TABLE players
                 ADD COLUMN IF NOT EXISTS first_name TEXT;
             """)
+            # бот заблокований юзером (ставить розсилка, знімає /start)
+            cur.execute("""
+                ALTER TABLE players
+                ADD COLUMN IF NOT EXISTS is_blocked BOOLEAN NOT NULL DEFAULT FALSE;
+            """)
+            # результати add_points за ключем ідемпотентності:
+            # key_hash = blake2b(user_id:ключ), 16 байт замість довільного тексту;
+            # рядки лише додаються, тож для чистки за часом вистачає BRIN
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS points_idempotency (
+                    key_hash   BYTEA PRIMARY KEY,
+                    delta      INTEGER NOT NULL,
+                    points     INTEGER NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_points_idempotency_created
+                ON points_idempotency USING BRIN (created_at);
+            """)
     finally:
         conn.close()
 
@@ -44,6 +107,11 @@ def get_points_pg(user_id: int) -> int:
     Якщо немає рядка з user_id — створює його з 0 балів.
     Потім повертає поточні points.
     """
+    if _points_cache is not None:
+        cached = _points_cache.get(user_id)
+        if cached is not None:
+            return cached
+
     conn = get_connection()
     try:
         with conn, conn.cursor() as cur:
@@ -63,7 +131,9 @@ def get_points_pg(user_id: int) -> int:
                 (user_id,)
             )
             row = cur.fetchone()
-            return row[0] if row else 0
+            points = row[0] if row else 0
+        _cache_points(user_id, points)
+        return points
     finally:
         conn.close()
 
@@ -81,9 +151,13 @@ def add_points_pg(user_id: int, amount: int):
                 VALUES (%s, %s)
                 ON CONFLICT (user_id)
                 DO UPDATE SET points = players.points + EXCLUDED.points
+                RETURNING points
                 """,
                 (user_id, amount)
             )
+            points = cur.fetchone()[0]
+        # у кеш — лише після commit
+        _cache_points(user_id, points)
     finally:
         conn.close()
 
@@ -103,10 +177,73 @@ def ensure_user_pg(user_id: int, user_name: str | None = None, first_name: str |
                 ON CONFLICT (user_id) DO UPDATE
                 SET 
                     user_name  = COALESCE(EXCLUDED.user_name, players.user_name),
-                    first_name = COALESCE(EXCLUDED.first_name, players.first_name);
+                    first_name = COALESCE(EXCLUDED.first_name, players.first_name),
+                    is_blocked = FALSE;
                 """,
                 (user_id, user_name, first_name)
             )
+        _profiles.pop(user_id)
+    finally:
+        conn.close()
+
+
+def ensure_user_and_get_points(
+    user_id: int,
+    user_name: str | None = None,
+    first_name: str | None = None,
+) -> int:
+    """
+    ensure_user_pg + get_points_pg одним запитом, з кешем профілю.
+
+    Якщо в кеші ті самі user_name / first_name — відповідь з пам'яті, без БД.
+    Інакше upsert, який переписує рядок лише коли імена справді змінились
+    (або юзер був позначений як is_blocked).
+    """
+    cached = _profiles.get(user_id)
+    if (
+        cached is not None
+        and (user_name is None or user_name == cached[0])
+        and (first_name is None or first_name == cached[1])
+    ):
+        return cached[2]
+
+    conn = get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                WITH upsert AS (
+                    INSERT INTO players (user_id, points, user_name, first_name)
+                    VALUES (%s, 0, %s, %s)
+                    ON CONFLICT (user_id) DO UPDATE
+                    SET
+                        user_name  = COALESCE(EXCLUDED.user_name, players.user_name),
+                        first_name = COALESCE(EXCLUDED.first_name, players.first_name),
+                        is_blocked = FALSE
+                    WHERE players.is_blocked
+                       OR players.user_name  IS DISTINCT FROM COALESCE(EXCLUDED.user_name, players.user_name)
+                       OR players.first_name IS DISTINCT FROM COALESCE(EXCLUDED.first_name, players.first_name)
+                    RETURNING user_name, first_name, points
+                )
+                SELECT user_name, first_name, points FROM upsert
+                UNION ALL
+                SELECT user_name, first_name, points
+                FROM players
+                WHERE user_id = %s
+                  AND NOT EXISTS (SELECT 1 FROM upsert)
+                """,
+                (user_id, user_name, first_name, user_id)
+            )
+            row = cur.fetchone()
+        if not row:
+            # рядок щойно вставив паралельний запит — він ще не видимий
+            # у знімку цього запиту, бали там 0
+            return 0
+
+        _profiles.set(user_id, row)
+        if _points_cache is not None:
+            _points_cache.set(user_id, row[2])
+        return row[2]
     finally:
         conn.close()
 
@@ -140,7 +277,95 @@ def add_points_and_return(user_id: int, delta: int) -> int:
                 )
                 row = cur.fetchone()
 
-            return row[0]
+        _cache_points(user_id, row[0])
+        return row[0]
+    finally:
+        conn.close()
+
+
+class IdempotencyConflict(Exception):
+    """
+    Ключ уже використаний з іншим delta.
+    """
+
+
+def _idempotency_hash(user_id: int, key: str) -> bytes:
+    return hashlib.blake2b(f"{user_id}:{key}".encode("utf-8"), digest_size=16).digest()
+
+
+def add_points_idempotent(user_id: int, delta: int, key: str) -> tuple[int, bool]:
+    """
+    add_points_and_return з ключем ідемпотентності.
+    Повертає (баланс, replayed): при повторі з тим самим ключем — баланс
+    з першого виклику, без повторного нарахування.
+
+    Ключ займається INSERT ... ON CONFLICT DO NOTHING у тій самій транзакції,
+    що й нарахування: паралельний повтор чекає на commit першого і бачить
+    уже збережений результат.
+    """
+    key_hash = _idempotency_hash(user_id, key)
+    conn = get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO points_idempotency (key_hash, delta, points)
+                VALUES (%s, %s, 0)
+                ON CONFLICT (key_hash) DO NOTHING
+                RETURNING 1
+                """,
+                (key_hash, delta)
+            )
+            if cur.fetchone() is None:
+                cur.execute(
+                    "SELECT delta, points FROM points_idempotency WHERE key_hash = %s",
+                    (key_hash,)
+                )
+                stored_delta, points = cur.fetchone()
+                if stored_delta != delta:
+                    raise IdempotencyConflict("idempotency_key_reused")
+                return points, True
+
+            cur.execute(
+                """
+                WITH p AS (
+                    INSERT INTO players (user_id, points)
+                    VALUES (%s, %s)
+                    ON CONFLICT (user_id) DO UPDATE
+                    SET points = players.points + EXCLUDED.points
+                    RETURNING points
+                )
+                UPDATE points_idempotency i
+                SET points = p.points
+                FROM p
+                WHERE i.key_hash = %s
+                RETURNING p.points
+                """,
+                (user_id, delta, key_hash)
+            )
+            points = cur.fetchone()[0]
+
+        _cache_points(user_id, points)
+        return points, False
+    finally:
+        conn.close()
+
+
+def purge_idempotency_keys() -> int:
+    """
+    Видаляє ключі ідемпотентності старші за IDEMPOTENCY_TTL_HOURS.
+    """
+    conn = get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM points_idempotency
+                WHERE created_at < NOW() - make_interval(hours => %s);
+                """,
+                (IDEMPOTENCY_TTL_HOURS,)
+            )
+            return cur.rowcount
     finally:
         conn.close()
 
@@ -0,0 +1,131 @@
+# bot_webhook.py — webhook-режим бота (aiohttp)
+"""
+Замість long polling Telegram сам шле апдейти POST-запитом на
+WEBHOOK_PATH. Так кілька процесів бота можуть стояти за балансувальником.
+
+- кожен запит перевіряється за заголовком X-Telegram-Bot-Api-Secret-Token
+  (WEBHOOK_SECRET), чужі отримують 403
+- апдейт кладеться в обмежену чергу application.update_queue, далі його
+  обробляють ті самі handlers, що й у polling-режимі
+- черга повна -> 503, Telegram повторить доставку пізніше
+
+GET /metrics — метрики бота (латентність handlers тощо) для Prometheus.
+
+Локально (або в тестах) WEBHOOK_URL можна не задавати: setWebhook не
+викликається, а апдейти може слати будь-який клієнт із правильним секретом.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+
+from aiohttp import web
+from telegram import Update
+
+import metrics
+from config import (
+    ADMIN_API_TOKEN,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# скільки одночасних з'єднань Telegram може відкрити до webhook
+MAX_CONNECTIONS = 40
+
+
+async def _handle_update(request: web.Request) -> web.Response:
+    application = request.app["ptb"]
+
+    token = request.headers.get(SECRET_HEADER, "")
+    if not hmac.compare_digest(token, WEBHOOK_SECRET):
+        return web.Response(status=403)
+
+    try:
+        data = await request.json()
+        update = Update.de_json(data, application.bot)
+    except (json.JSONDecodeError, UnicodeDecodeError, TypeError, KeyError, ValueError):
+        return web.Response(status=400)
+    if update is None:
+        return web.Response(status=400)
+
+    try:
+        application.update_queue.put_nowait(update)
+    except asyncio.QueueFull:
+        logger.warning("Webhook queue full, update %s rejected", update.update_id)
+        return web.Response(status=503)
+
+    return web.Response(text="ok")
+
+
+async def _healthz(request: web.Request) -> web.Response:
+    return web.json_response({
+        "ok": True,
+        "queue": request.app["ptb"].update_queue.qsize(),
+    })
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    # той самий токен, що й для адмінських ендпоінтів API
+    token = request.headers.get("X-Admin-Token", "")
+    auth = request.headers.get("Authorization", "")
+    if not token and auth.startswith("Bearer "):
+        token = auth[len("Bearer "):]
+    if not ADMIN_API_TOKEN or not hmac.compare_digest(token, ADMIN_API_TOKEN):
+        return web.Response(status=403)
+
+    return web.Response(
+        body=metrics.render().encode("utf-8"),
+        headers={"Content-Type": metrics.CONTENT_TYPE},
+    )
+
+
+def build_webhook_app(application) -> web.Application:
+    aio = web.Application()
+    aio["ptb"] = application
+    aio.router.add_post(WEBHOOK_PATH, _handle_update)
+    aio.router.add_get("/healthz", _healthz)
+    aio.router.add_get("/metrics", _metrics)
+    return aio
+
+
+async def run_webhook(application) -> None:
+    """
+    Запускає application (без Updater) і aiohttp-сервер, працює до скасування.
+    """
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET is required in webhook mode")
+
+    runner = web.AppRunner(build_webhook_app(application))
+
+    async with application:
+        # run_polling/run_webhook самі викликають post_init / post_shutdown,
+        # тут запускаємо вручну
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await runner.setup()
+        await web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT).start()
+
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=MAX_CONNECTIONS,
+            )
+        logger.info("Webhook listening on %s:%s%s", WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH)
+
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+            await application.stop()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
@@ -0,0 +1,544 @@
+# broadcast.py — розсилка повідомлення всім гравцям (адмінська /broadcast)
+"""
+Отримувачі читаються з players server-side курсором по user_id,
+повідомлення шлють кілька asyncio-воркерів під загальним лімітом
+Telegram (GLOBAL_RATE повідомлень/с) і лімітом на один чат.
+
+- RetryAfter (flood wait) — пауза для всіх воркерів і повтор
+- Forbidden (бот заблокований / акаунт видалено) — players.is_blocked = TRUE,
+  наступні розсилки таких пропускають
+- прогрес (останній user_id, до якого все надіслано, лічильники) пишеться
+  в broadcasts кожні CHECKPOINT_EVERY повідомлень, тож перервану розсилку
+  можна продовжити з того ж місця (/broadcast_resume або при старті бота)
+- розсилку виконує лише процес, що її захопив (claimed_by / claimed_at,
+  оренда на LEASE_SEC, продовжується поки йде розсилка), тож кілька
+  інстансів бота не шлють те саме повідомлення двічі
+- кожен процес раз на RESUME_CHECK_SEC підхоплює running-розсилки без
+  живої оренди: якщо власник упав, не звільнивши її (SIGTERM, OOM), після
+  LEASE_SEC розсилку продовжить будь-який живий інстанс, зокрема він сам
+  після рестарту
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TimedOut, NetworkError
+
+import bd
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 25          # повідомлень на секунду на весь бот
+PER_CHAT_INTERVAL = 1.0   # не частіше одного повідомлення в чат за секунду
+WORKERS = 16
+FETCH_SIZE = 1000
+CHECKPOINT_EVERY = 200
+MAX_ATTEMPTS = 3
+# оренда розсилки: чужий процес може забрати її, лише коли оренда прострочена
+LEASE_SEC = 120
+LEASE_RENEW_SEC = 30
+# як часто шукати розсилки без власника (прострочена або вільна оренда)
+RESUME_CHECK_SEC = 60
+
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+# =========================
+#   DB
+# =========================
+
+def init_broadcast_tables():
+    conn = bd.get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS broadcasts (
+                    id           BIGSERIAL PRIMARY KEY,
+                    text         TEXT NOT NULL,
+                    created_by   BIGINT,
+                    status       TEXT NOT NULL DEFAULT 'running',
+                    last_user_id BIGINT NOT NULL DEFAULT 0,
+                    sent         INTEGER NOT NULL DEFAULT 0,
+                    failed       INTEGER NOT NULL DEFAULT 0,
+                    blocked      INTEGER NOT NULL DEFAULT 0,
+                    created_at   TIMESTAMP NOT NULL DEFAULT NOW(),
+                    finished_at  TIMESTAMP
+                );
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE broadcasts
+                ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+                ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP;
+                """
+            )
+    finally:
+        conn.close()
+
+
+def create_broadcast(text: str, created_by: int) -> int:
+    conn = bd.get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO broadcasts (text, created_by)
+                VALUES (%s, %s)
+                RETURNING id
+                """,
+                (text, created_by),
+            )
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def get_broadcast(broadcast_id: int | None = None) -> dict | None:
+    """
+    Розсилка по id або остання, якщо id не вказано.
+    """
+    conn = bd.get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT id, text, status, last_user_id, sent, failed, blocked
+                FROM broadcasts
+                WHERE %s IS NULL OR id = %s
+                ORDER BY id DESC
+                LIMIT 1
+                """,
+                (broadcast_id, broadcast_id),
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+            keys = ("id", "text", "status", "last_user_id", "sent", "failed", "blocked")
+            return dict(zip(keys, row))
+    finally:
+        conn.close()
+
+
+def get_running_broadcast_ids() -> list[int]:
+    """
+    Незавершені розсилки, які зараз можна захопити (оренда вільна або прострочена).
+    """
+    conn = bd.get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT id FROM broadcasts
+                WHERE status = 'running'
+                  AND (claimed_by IS NULL
+                       OR claimed_at < NOW() - make_interval(secs => %s))
+                ORDER BY id
+                """,
+                (LEASE_SEC,),
+            )
+            return [r[0] for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def claim_broadcast(broadcast_id: int) -> bool:
+    """
+    Захоплює незавершену розсилку для цього процесу. False — її вже
+    виконує інший процес (оренда ще не прострочена) або вона не running.
+    """
+    conn = bd.get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE broadcasts
+                SET claimed_by = %s, claimed_at = NOW()
+                WHERE id = %s
+                  AND status = 'running'
+                  AND (claimed_by IS NULL
+                       OR claimed_at < NOW() - make_interval(secs => %s))
+                RETURNING id
+                """,
+                (INSTANCE_ID, broadcast_id, LEASE_SEC),
+            )
+            return cur.fetchone() is not None
+    finally:
+        conn.close()
+
+
+def renew_claim(broadcast_id: int) -> bool:
+    """
+    Продовжує оренду; False — розсилку вже забрав інший процес.
+    """
+    conn = bd.get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE broadcasts
+                SET claimed_at = NOW()
+                WHERE id = %s AND claimed_by = %s
+                """,
+                (broadcast_id, INSTANCE_ID),
+            )
+            return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def release_claim(broadcast_id: int) -> None:
+    conn = bd.get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE broadcasts
+                SET claimed_by = NULL, claimed_at = NULL
+                WHERE id = %s AND claimed_by = %s
+                """,
+                (broadcast_id, INSTANCE_ID),
+            )
+    finally:
+        conn.close()
+
+
+def save_progress(
+    broadcast_id: int,
+    last_user_id: int,
+    sent: int,
+    failed: int,
+    blocked_ids: list[int],
+    finished: bool = False,
+) -> None:
+    """
+    Чекпоінт: прогрес розсилки + позначка заблокованих юзерів, одна транзакція.
+    Прогрес пишеться лише поки розсилка захоплена цим процесом
+    (заодно продовжує оренду).
+    """
+    conn = bd.get_connection()
+    try:
+        with conn, conn.cursor() as cur:
+            if blocked_ids:
+                cur.execute(
+                    "UPDATE players SET is_blocked = TRUE WHERE user_id = ANY(%s)",
+                    (blocked_ids,),
+                )
+            cur.execute(
+                """
+                UPDATE broadcasts
+                SET last_user_id = GREATEST(last_user_id, %s),
+                    sent = %s,
+                    failed = %s,
+                    blocked = blocked + %s,
+                    status = CASE WHEN %s THEN 'finished' ELSE status END,
+                    finished_at = CASE WHEN %s THEN NOW() ELSE finished_at END,
+                    claimed_at = NOW()
+                WHERE id = %s AND claimed_by = %s
+                """,
+                (last_user_id, sent, failed, len(blocked_ids),
+                 finished, finished, broadcast_id, INSTANCE_ID),
+            )
+        # інакше /start із кешу не зніме is_blocked
+        bd.forget_profiles(blocked_ids)
+    finally:
+        conn.close()
+
+
+class _RecipientStream:
+    """
+    Server-side курсор по players (user_id > after, не заблоковані).
+    fetch() викликається з потоку, щоб не блокувати event loop.
+    З'єднання живе всю розсилку, тож окреме, не з пулу.
+    """
+
+    def __init__(self, broadcast_id: int, after_user_id: int):
+        self.conn = db_pool.direct_connection()
+        self.cur = self.conn.cursor(name=f"broadcast_{broadcast_id}")
+        self.cur.execute(
+            """
+            SELECT user_id
+            FROM players
+            WHERE user_id > %s
+              AND NOT is_blocked
+            ORDER BY user_id
+            """,
+            (after_user_id,),
+        )
+
+    def fetch(self) -> list[int]:
+        return [r[0] for r in self.cur.fetchmany(FETCH_SIZE)]
+
+    def close(self) -> None:
+        try:
+            self.cur.close()
+            self.conn.rollback()
+        finally:
+            self.conn.close()
+
+
+# =========================
+#   ВІДПРАВКА
+# =========================
+
+class _AsyncRateLimiter:
+    """
+    Загальний ліміт (token bucket) + пауза для всіх при flood wait.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class BroadcastRun:
+
+    def __init__(self, bot, broadcast: dict):
+        self.bot = bot
+        self.id = broadcast["id"]
+        self.text = broadcast["text"]
+        self.start_after = broadcast["last_user_id"]
+        self.sent = broadcast["sent"]
+        self.failed = broadcast["failed"]
+        self.blocked = broadcast["blocked"]
+
+        self._limiter = _AsyncRateLimiter(GLOBAL_RATE)
+        self._last_sent_to: dict[int, float] = {}
+        self._order: list[int] = []      # user_id у порядку видачі
+        self._done: set[int] = set()
+        self._head = 0
+        self._checkpoint_user = self.start_after
+        self._new_blocked: list[int] = []
+        self._since_checkpoint = 0
+        # чекпоінти пишуться по черзі, інакше старіші значення sent/failed
+        # могли б закомітитись після новіших
+        self._checkpoint_lock = asyncio.Lock()
+
+    async def _send_one(self, user_id: int) -> str:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await self._limiter.acquire()
+
+            # ліміт на один чат (актуально для повторів)
+            last = self._last_sent_to.get(user_id)
+            if last is not None:
+                wait = last + PER_CHAT_INTERVAL - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            self._last_sent_to[user_id] = time.monotonic()
+
+            try:
+                await self.bot.send_message(chat_id=user_id, text=self.text)
+                return "sent"
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if not isinstance(retry_after, (int, float)):
+                    retry_after = retry_after.total_seconds()
+                logger.warning("Broadcast %s: flood wait %ss", self.id, retry_after)
+                self._limiter.pause(retry_after)
+            except Forbidden:
+                return "blocked"
+            except BadRequest as e:
+                logger.info("Broadcast %s: %s -> %s", self.id, user_id, e)
+                return "failed"
+            except (TimedOut, NetworkError) as e:
+                logger.warning("Broadcast %s: network error %s (attempt %s)", self.id, e, attempt)
+                await asyncio.sleep(attempt)
+            except Exception:
+                # ChatMigrated та інше — не зупиняємо воркер
+                logger.exception("Broadcast %s: failed to send to %s", self.id, user_id)
+                return "failed"
+        return "failed"
+
+    def _advance(self, user_id: int, outcome: str) -> bool:
+        """
+        Фіксує результат; повертає True, якщо час писати чекпоінт.
+        Чекпоінт — найбільший user_id, до якого ВСІ вже оброблені.
+        """
+        if outcome == "sent":
+            self.sent += 1
+        elif outcome == "blocked":
+            self._new_blocked.append(user_id)
+        else:
+            self.failed += 1
+
+        self._last_sent_to.pop(user_id, None)
+        self._done.add(user_id)
+        while self._head < len(self._order) and self._order[self._head] in self._done:
+            self._done.discard(self._order[self._head])
+            self._checkpoint_user = self._order[self._head]
+            self._head += 1
+        if self._head > 10_000:
+            del self._order[:self._head]
+            self._head = 0
+
+        self._since_checkpoint += 1
+        return self._since_checkpoint >= CHECKPOINT_EVERY
+
+    async def _checkpoint(self, finished: bool = False) -> None:
+        async with self._checkpoint_lock:
+            blocked = self._new_blocked
+            self._new_blocked = []
+            self._since_checkpoint = 0
+            try:
+                await asyncio.to_thread(
+                    save_progress,
+                    self.id,
+                    self._checkpoint_user,
+                    self.sent,
+                    self.failed,
+                    blocked,
+                    finished,
+                )
+            except BaseException:
+                # не записалось — заблоковані підуть з наступним чекпоінтом
+                self._new_blocked[:0] = blocked
+                raise
+            self.blocked += len(blocked)
+
+    async def run(self) -> None:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=WORKERS * 4)
+
+        async def worker():
+            while True:
+                user_id = await queue.get()
+                try:
+                    if user_id is None:
+                        return
+                    try:
+                        outcome = await self._send_one(user_id)
+                    except Exception:
+                        logger.exception("Broadcast %s: error for %s", self.id, user_id)
+                        outcome = "failed"
+                    if self._advance(user_id, outcome):
+                        try:
+                            await self._checkpoint()
+                        except Exception:
+                            # наступний чекпоінт запише той самий прогрес
+                            logger.exception("Broadcast %s: checkpoint failed", self.id)
+                finally:
+                    queue.task_done()
+
+        main = asyncio.current_task()
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(LEASE_RENEW_SEC)
+                try:
+                    owned = await asyncio.to_thread(renew_claim, self.id)
+                except Exception:
+                    logger.exception("Broadcast %s: lease renewal failed", self.id)
+                    continue
+                if not owned:
+                    logger.error("Broadcast %s: claimed by another process, stopping", self.id)
+                    main.cancel()
+                    return
+
+        workers = [asyncio.create_task(worker()) for _ in range(WORKERS)]
+        lease = asyncio.create_task(heartbeat())
+        stream = await asyncio.to_thread(_RecipientStream, self.id, self.start_after)
+        try:
+            while True:
+                batch = await asyncio.to_thread(stream.fetch)
+                if not batch:
+                    break
+                for user_id in batch:
+                    self._order.append(user_id)
+                    await queue.put(user_id)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            await self._checkpoint(finished=True)
+            logger.info(
+                "Broadcast %s finished: sent=%s failed=%s blocked=%s",
+                self.id, self.sent, self.failed, self.blocked,
+            )
+        except BaseException:
+            for w in workers:
+                w.cancel()
+            # зберігаємо те, що встигли (до першого необробленого user_id)
+            await self._checkpoint()
+            raise
+        finally:
+            lease.cancel()
+            await asyncio.to_thread(stream.close)
+
+
+_running: dict[int, asyncio.Task] = {}
+
+
+async def start_broadcast(bot, broadcast_id: int) -> bool:
+    """
+    Запускає (або продовжує) розсилку у фоні. False — вже виконується
+    (тут чи в іншому процесі), не знайдена або завершена.
+    """
+    if broadcast_id in _running and not _running[broadcast_id].done():
+        return False
+
+    if not await asyncio.to_thread(claim_broadcast, broadcast_id):
+        return False
+    try:
+        broadcast = await asyncio.to_thread(get_broadcast, broadcast_id)
+    except BaseException:
+        await asyncio.to_thread(release_claim, broadcast_id)
+        raise
+    if not broadcast:
+        return False
+
+    async def run_claimed():
+        try:
+            await BroadcastRun(bot, broadcast).run()
+        finally:
+            await asyncio.to_thread(release_claim, broadcast_id)
+
+    task = asyncio.get_running_loop().create_task(run_claimed())
+    _running[broadcast_id] = task
+    task.add_done_callback(lambda t: _running.pop(broadcast_id, None))
+    return True
+
+
+async def resume_running_broadcasts(bot) -> None:
+    """
+    Продовжує незавершені розсилки, які зараз ніхто не виконує.
+    """
+    for broadcast_id in await asyncio.to_thread(get_running_broadcast_ids):
+        if await start_broadcast(bot, broadcast_id):
+            logger.info("Broadcast %s resumed", broadcast_id)
+
+
+async def watch_running_broadcasts(bot, interval: float = RESUME_CHECK_SEC) -> None:
+    """
+    Фонова задача: одразу і далі кожні interval секунд підхоплює
+    розсилки, чий власник зник (оренда прострочена).
+    """
+    while True:
+        try:
+            await resume_running_broadcasts(bot)
+        except Exception as e:
+            logger.warning("Broadcast resume check failed: %s", e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,89 @@
+# cache.py — простий LRU-кеш з TTL для процесу (бот / API)
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+class LRUCache:
+    """
+    Обмежений за розміром LRU-кеш з часом життя записів.
+
+    - maxsize: скільки ключів тримати; найстаріші за використанням витісняються
+    - ttl:     час життя запису за замовчуванням (сек), None — без обмеження
+    - set(..., expires_at=...) дозволяє задати свій момент протухання
+      (time.time()), але не пізніше за ttl
+    - name: під цим іменем hits / misses / розмір видно на /metrics
+
+    Потокобезпечний: один lock на кеш, всі операції O(1).
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None, name: str | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            metrics.register_cache(name, self)
+
+    def _expiry(self, expires_at: float | None) -> float | None:
+        if self.ttl is None:
+            return expires_at
+        limit = time.time() + self.ttl
+        return limit if expires_at is None else min(expires_at, limit)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at: float | None = None) -> None:
+        with self._lock:
+            self._data[key] = (value, self._expiry(expires_at))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def update(self, key, fn) -> bool:
+        """
+        Змінює значення на місці (write-through), якщо ключ є в кеші.
+        fn(value) -> новий value. Час життя запису не змінюється.
+        Повертає True, якщо запис був.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return False
+            self._data[key] = (fn(value), expires_at)
+            return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,267 @@
+# channel_membership.py — перевірка підписки на канали промо-розіграшу
+"""
+Перед участю в promo-розіграші перевіряємо, що юзер підписаний
+на всі канали з promo_giveaway_channels (Bot API getChatMember).
+
+- результати кешуються: "підписаний" — POSITIVE_TTL_SEC,
+  "не підписаний" / "не вдалося перевірити" — NEGATIVE_TTL_SEC
+- одночасні запити на ту ж пару (канал, юзер) чекають один виклик
+- канали перевіряються паралельно (пул потоків), але загальна частота
+  викликів Telegram обмежена token bucket
+- транспорт підмінний: за замовчуванням HTTP до TELEGRAM_API_URL,
+  у тестах — локальний фейковий Bot API або будь-який callable
+- канали, які перевірити неможливо (бот не адмін, канал не знайдено),
+  участь не блокують; а flood wait, мережеві помилки і відповідь, довша
+  за LOOKUP_TIMEOUT_SEC, — MembershipCheckUnavailable (API віддає 503,
+  клієнт повторює), щоб під обмеженням Telegram не пускати всіх підряд
+
+Тобто на одну пару (канал, юзер) — не більше одного запиту до Telegram за TTL.
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import giveaway_db_from_admin as gdb
+from cache import LRUCache
+from config import BOT_TOKEN, TELEGRAM_API_URL
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+POSITIVE_TTL_SEC = 600
+NEGATIVE_TTL_SEC = 30
+CHANNELS_TTL_SEC = 60
+CACHE_SIZE = 200_000
+MAX_WORKERS = 8
+# загальний ліміт getChatMember на секунду (ліміт Bot API ~30 запитів/с)
+CALLS_PER_SEC = 20
+# скільки запит до API чекає на перевірку, далі — 503
+LOOKUP_TIMEOUT_SEC = 3
+# Retry-After для клієнта, якщо Telegram не назвав свій
+DEFAULT_RETRY_AFTER_SEC = 1
+
+MEMBER_STATUSES = ("creator", "administrator", "member")
+
+
+class TelegramAPIError(Exception):
+
+    def __init__(self, description: str, retry_after: int | None = None, error_code: int | None = None):
+        super().__init__(description)
+        self.retry_after = retry_after
+        self.error_code = error_code
+
+    @property
+    def transient(self) -> bool:
+        # flood wait і збої Telegram; решта (бот не адмін, канал не знайдено) — стала
+        return self.retry_after is not None or (self.error_code or 0) == 429 or (self.error_code or 0) >= 500
+
+
+class MembershipCheckUnavailable(Exception):
+    """
+    Підписку зараз перевірити не можна (flood wait, мережа, черга перевірок
+    переповнена) — клієнт має повторити через retry_after секунд.
+    """
+
+    def __init__(self, reason: str, retry_after: float = DEFAULT_RETRY_AFTER_SEC):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class TelegramHTTPTransport:
+    """
+    getChatMember через HTTP. base_url можна направити на фейковий Bot API.
+    Повертає поле result (dict з "status", "is_member" тощо).
+    """
+
+    def __init__(self, token: str | None = BOT_TOKEN, base_url: str = TELEGRAM_API_URL, timeout: float = 5):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def __call__(self, chat_id: str, user_id: int) -> dict:
+        query = urllib.parse.urlencode({"chat_id": chat_id, "user_id": user_id})
+        url = f"{self.base_url}/bot{self.token}/getChatMember?{query}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+                data = json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            try:
+                data = json.loads(e.read().decode("utf-8"))
+            except Exception:
+                raise TelegramAPIError(f"http_{e.code}", error_code=e.code)
+
+        if not data.get("ok"):
+            params = data.get("parameters") or {}
+            raise TelegramAPIError(
+                data.get("description", "telegram_error"),
+                retry_after=params.get("retry_after"),
+                error_code=data.get("error_code"),
+            )
+        return data["result"]
+
+
+def link_to_chat_id(link: str) -> str | None:
+    """
+    "https://t.me/dreamx" / "t.me/dreamx" / "@dreamx" -> "@dreamx".
+    Приватні інвайти (t.me/+..., joinchat) перевірити не можна -> None.
+    """
+    link = (link or "").strip()
+    if link.startswith("@"):
+        return link
+    if link.lstrip("-").isdigit():
+        return link
+
+    parsed = urllib.parse.urlparse(link if "://" in link else f"https://{link}")
+    if parsed.netloc not in ("t.me", "telegram.me", "www.t.me"):
+        return None
+
+    name = parsed.path.strip("/").split("/")[0]
+    if not name or name.startswith("+") or name == "joinchat":
+        return None
+    return f"@{name}"
+
+
+class MembershipVerifier:
+
+    def __init__(
+        self,
+        transport=None,
+        positive_ttl: float = POSITIVE_TTL_SEC,
+        negative_ttl: float = NEGATIVE_TTL_SEC,
+        calls_per_sec: float = CALLS_PER_SEC,
+        max_workers: int = MAX_WORKERS,
+    ):
+        self.transport = transport or TelegramHTTPTransport()
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.remote_calls = 0
+
+        self._results = LRUCache(maxsize=CACHE_SIZE, ttl=positive_ttl, name="channel_membership")
+        self._channels = LRUCache(maxsize=10_000, ttl=CHANNELS_TTL_SEC, name="promo_channels")
+        self._bucket = TokenBucket(rate=calls_per_sec)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="membership")
+        self._inflight: dict[tuple[str, int], Future] = {}
+        self._lock = threading.Lock()
+        # після flood wait не смикаємо Telegram до цього моменту (time.monotonic)
+        self._paused_until = 0.0
+
+    def _check_paused(self) -> None:
+        wait = self._paused_until - time.monotonic()
+        if wait > 0:
+            raise MembershipCheckUnavailable("flood_wait", retry_after=wait)
+
+    def _remote_check(self, chat_id: str, user_id: int) -> bool | None:
+        """
+        True / False — підписаний чи ні, None — канал перевірити неможливо.
+        Тимчасові збої — MembershipCheckUnavailable (не кешуються).
+        """
+        self._check_paused()
+        self._bucket.acquire()
+        self.remote_calls += 1
+        try:
+            member = self.transport(chat_id, user_id)
+        except TelegramAPIError as e:
+            if e.transient:
+                retry_after = e.retry_after or DEFAULT_RETRY_AFTER_SEC
+                if e.retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                logger.warning("getChatMember %s/%s unavailable: %s", chat_id, user_id, e)
+                raise MembershipCheckUnavailable("telegram_unavailable", retry_after=retry_after)
+            # бот не адмін у каналі, канал не знайдено тощо
+            logger.warning("getChatMember %s/%s failed: %s", chat_id, user_id, e)
+            return None
+        except Exception as e:
+            logger.warning("getChatMember %s/%s error: %s", chat_id, user_id, e)
+            raise MembershipCheckUnavailable("telegram_unavailable")
+
+        status = member.get("status")
+        if status in MEMBER_STATUSES:
+            return True
+        if status == "restricted":
+            return bool(member.get("is_member"))
+        return False
+
+    def _check_and_store(self, key: tuple[str, int]) -> bool | None:
+        try:
+            result = self._remote_check(*key)
+            ttl = self.positive_ttl if result else self.negative_ttl
+            self._results.set(key, result, expires_at=time.time() + ttl)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _lookup(self, chat_id: str, user_id: int) -> Future:
+        key = (chat_id, user_id)
+        fut: Future = Future()
+
+        cached = self._results.get(key, default=fut)
+        if cached is not fut:
+            fut.set_result(cached)
+            return fut
+        self._check_paused()
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                return inflight
+            # могли дописати в кеш, поки чекали lock
+            cached = self._results.get(key, default=fut)
+            if cached is not fut:
+                fut.set_result(cached)
+                return fut
+            fut = self._pool.submit(self._check_and_store, key)
+            self._inflight[key] = fut
+            return fut
+
+    @staticmethod
+    def _result(fut: Future, deadline: float) -> bool | None:
+        try:
+            return fut.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            raise MembershipCheckUnavailable("membership_check_busy")
+
+    def is_member(self, chat_id: str, user_id: int, timeout: float = LOOKUP_TIMEOUT_SEC) -> bool | None:
+        deadline = time.monotonic() + timeout
+        return self._result(self._lookup(chat_id, user_id), deadline)
+
+    def missing_channels(self, promo_id: int, user_id: int, timeout: float = LOOKUP_TIMEOUT_SEC) -> list[str]:
+        """
+        Посилання каналів promo, на які юзер НЕ підписаний.
+        Канали, які неможливо перевірити (приватні інвайти, бот не адмін),
+        не блокують участь. MembershipCheckUnavailable — перевірка не вклалась
+        у timeout або Telegram тимчасово недоступний.
+        """
+        deadline = time.monotonic() + timeout
+        links = self._channels.get(promo_id)
+        if links is None:
+            links = gdb.get_promo_channel_links(promo_id)
+            self._channels.set(promo_id, links)
+
+        checks = []
+        for link in links:
+            chat_id = link_to_chat_id(link)
+            if chat_id is None:
+                continue
+            checks.append((link, self._lookup(chat_id, user_id)))
+
+        return [link for link, fut in checks if self._result(fut, deadline) is False]
+
+
+_verifier: MembershipVerifier | None = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier() -> MembershipVerifier:
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            _verifier = MembershipVerifier()
+        return _verifier
@@ -0,0 +1,52 @@
+# combined.py — бот і HTTP API в одному процесі
+"""
+Опційна точка входу замість двох процесів (main.py + api_server.py).
+
+- таблиці ініціалізуються один раз
+- один пул з'єднань (db_pool, лише в цьому режимі) і ті самі кеші
+  модулів для бота й API; handlers бота мають окремий резервний пул
+- кеш балансів (bd) увімкнено: бали, нараховані ботом чи API,
+  одразу видно і в /mypoints, і у WebApp (/api/get_points)
+- бот працює в asyncio-циклі головного потоку (polling або webhook за BOT_MODE),
+  HTTP API (ThreadingHTTPServer) — у фоновому потоці
+
+Запуск: python3 combined.py
+"""
+
+import asyncio
+import threading
+
+import api_server
+import bd
+import bot_webhook
+import broadcast
+import db_pool
+import main
+from config import BOT_MODE, COMBINED_DB_POOL_SIZE, WEBHOOK_PORT
+from one_vs_one_db import init_one_vs_one_tables
+
+
+def init_tables() -> None:
+    api_server.init_tables()
+    init_one_vs_one_tables()
+    broadcast.init_broadcast_tables()
+
+
+if __name__ == "__main__":
+    if BOT_MODE == "webhook" and WEBHOOK_PORT == api_server.api_port():
+        raise RuntimeError("WEBHOOK_PORT must differ from the API PORT in combined mode")
+
+    db_pool.enable_pool(COMBINED_DB_POOL_SIZE)
+    bd.enable_points_cache()
+    init_tables()
+    api_server.start_background_jobs()
+
+    threading.Thread(target=api_server.run_api, name="http-api", daemon=True).start()
+
+    app = main.build_application()
+    if BOT_MODE == "webhook":
+        print("Bot + API are running (webhook)...")
+        asyncio.run(bot_webhook.run_webhook(app))
+    else:
+        print("Bot + API are running...")
+        app.run_polling()
@@ -14,3 +14,63 @@ else:
     BOT_TOKEN = os.getenv("BOT_TOKEN_DEV")
     DATABASE_URL = os.getenv("DATABASE_URL_DEV")
     WEBAPP_URL = "https://dreamx-webapp-dev.onrender.com"
+
+
+# Турніри: скільки секунд гравець має на хід у матчі (далі — автопоразка)
+MATCH_MOVE_TIMEOUT_SEC = int(os.getenv("MATCH_MOVE_TIMEOUT_SEC", "300"))
+
+# Токен для адмінських ендпоінтів API (заголовок X-Admin-Token).
+# Якщо не заданий — адмінські ендпоінти вимкнені.
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+# Адреса Bot API (для тестів можна підставити локальний фейковий Telegram)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+# Режим бота: "polling" (dev за замовчуванням) або "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Webhook: публічна адреса (без шляху), на яку Telegram шле апдейти.
+# Якщо не задана — setWebhook не викликається (локальні тести, ручне налаштування).
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8443")))
+# Секрет із заголовка X-Telegram-Bot-Api-Secret-Token (обов'язковий у webhook-режимі)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Скільки апдейтів чекають обробки; далі — 503 і Telegram повторить пізніше
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+# Скільки апдейтів обробляються одночасно
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "32"))
+
+# Пул з'єднань з БД на процес (db_pool). 0 — без пулу.
+# Окремі main.py / api_server.py за замовчуванням без пулу; combined.py
+# вмикає пул (db_pool.enable_pool) розміром COMBINED_DB_POOL_SIZE
+# (окрема змінна: DB_POOL_SIZE для combined.py не діє).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
+COMBINED_DB_POOL_SIZE = int(os.getenv("COMBINED_DB_POOL_SIZE", "10"))
+# Окремий маленький пул для синхронних викликів БД з asyncio-циклу бота:
+# потоки API, що вичерпали основний пул, не блокують цикл на очікуванні
+DB_BOT_POOL_SIZE = int(os.getenv("DB_BOT_POOL_SIZE", "2"))
+# Скільки чекати вільне з'єднання, перш ніж віддати помилку
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "5"))
+
+# Статистика SQL-запитів (db_stats): 1 — вимірювати кожен запит
+DB_QUERY_STATS = os.getenv("DB_QUERY_STATS", "0") == "1"
+# Запити, довші за це (мс), пишуться в лог db.slow (лише коли DB_QUERY_STATS=1)
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+# Адмінські ендпоінти профілювання (/api/admin/profile, /api/admin/tracemalloc)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+
+# Ліміти частоти запитів до API (api_limits): 0 — вимкнено
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# Скільки довірених проксі стоїть перед API (IP клієнта — стільки-й з кінця
+# в X-Forwarded-For). 0 (за замовчуванням) — X-Forwarded-For ігнорується,
+# береться адреса з'єднання: інакше клієнт, що ходить напряму, підставить
+# заголовок сам і обійде ліміт на IP. За балансувальником (Render, nginx),
+# який дописує свій запис у X-Forwarded-For, — 1.
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+# Скидання навантаження: коли згладжене очікування з'єднання з БД перевищує
+# поріг (мс) — 503 спершу для фонових читань (low), потім для звичайних
+SHED_LOW_WAIT_MS = float(os.getenv("SHED_LOW_WAIT_MS", "100"))
+SHED_NORMAL_WAIT_MS = float(os.getenv("SHED_NORMAL_WAIT_MS", "500"))
@@ -0,0 +1,316 @@
+# db_pool.py — спільний пул з'єднань PostgreSQL для всіх модулів
+"""
+bd.get_connection() і _get_conn() усіх модулів беруть з'єднання звідси.
+
+- з'єднання відкриваються ліниво, не більше DB_POOL_SIZE на процес
+- conn.close() повертає з'єднання в пул (незавершена транзакція
+  відкочується), тож код виду try/finally conn.close() і `with conn`
+  працює без змін
+- якщо вільних немає — чекаємо до DB_POOL_TIMEOUT_SEC, далі PoolTimeout
+- з'єднання, що простояли довше MAX_IDLE_SEC або зламались, закриваються
+- DB_POOL_SIZE=0 — без пулу, нове з'єднання на кожен виклик (як раніше);
+  так за замовчуванням у окремих main.py / api_server.py, combined.py
+  вмикає пул через enable_pool()
+- виклики з потоку, де працює asyncio-цикл (handlers бота), беруть
+  з'єднання з окремого резервного пулу на DB_BOT_POOL_SIZE: коли потоки
+  API вичерпали основний, цикл не стоїть до DB_POOL_TIMEOUT_SEC
+- recent_wait() — згладжений час очікування з'єднання (для скидання
+  навантаження в API), без нових очікувань сам спадає до нуля; без пулу
+  рахується час відкриття нового з'єднання в connect() — коли база
+  перевантажена, росте саме він
+
+Для сесійних і довгих речей (advisory lock, LISTEN, server-side курсор
+розсилки) — direct_connection(), таке з'єднання в пул не повертається
+і слот не займає.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+import db_stats
+import metrics
+from config import DATABASE_URL, DB_BOT_POOL_SIZE, DB_POOL_SIZE, DB_POOL_TIMEOUT_SEC
+
+logger = logging.getLogger(__name__)
+
+SSLMODE = os.getenv("PG_SSLMODE", "require")
+MAX_IDLE_SEC = 300
+# згладжування recent_wait(): вага нового очікування і період напіврозпаду
+WAIT_EWMA_ALPHA = 0.2
+WAIT_HALF_LIFE_SEC = 5.0
+
+POOL_WAIT = metrics.Histogram(
+    "db_pool_wait_seconds", "Time waiting for a free pooled connection",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0),
+)
+POOL_CHECKOUT = metrics.Histogram(
+    "db_pool_checkout_seconds", "How long a pooled connection is held",
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _WaitTracker:
+    """
+    EWMA часу очікування з'єднання, що з часом спадає до нуля.
+    """
+
+    def __init__(self):
+        self._ewma = 0.0
+        self._at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _decayed(self, now: float) -> float:
+        return self._ewma * 0.5 ** ((now - self._at) / WAIT_HALF_LIFE_SEC)
+
+    def track(self, waited: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._ewma = self._decayed(now) * (1 - WAIT_EWMA_ALPHA) + waited * WAIT_EWMA_ALPHA
+            self._at = now
+
+    def value(self) -> float:
+        return self._decayed(time.monotonic())
+
+
+def direct_connection():
+    if db_stats.ENABLED:
+        return psycopg2.connect(
+            DATABASE_URL,
+            sslmode=SSLMODE,
+            connection_factory=db_stats.InstrumentedConnection,
+        )
+    return psycopg2.connect(DATABASE_URL, sslmode=SSLMODE)
+
+
+class _PooledConnection:
+    """
+    Обгортка над psycopg2-з'єднанням: усе делегується, крім close().
+    """
+
+    __slots__ = ("_conn", "_pool", "_released", "_acquired_at")
+
+    def __init__(self, conn, pool: "ConnectionPool"):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_released", False)
+        object.__setattr__(self, "_acquired_at", time.monotonic())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def close(self) -> None:
+        if self._released:
+            return
+        object.__setattr__(self, "_released", True)
+        POOL_CHECKOUT.observe(time.monotonic() - self._acquired_at)
+        self._pool.release(self._conn)
+
+
+class ConnectionPool:
+
+    def __init__(self, maxsize: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT_SEC):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle: list[tuple[object, float]] = []   # (conn, коли повернули), LIFO
+        self._slots = threading.BoundedSemaphore(maxsize)
+        self._lock = threading.Lock()
+
+        # статистика (читається без lock, точність не критична)
+        self.opened = 0
+        self.in_use = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.last_wait = 0.0
+        self._wait = _WaitTracker()
+
+    def acquire(self) -> _PooledConnection:
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.timeouts += 1
+            self._wait.track(self.timeout)
+            raise PoolTimeout("db_pool_timeout")
+        waited = time.monotonic() - started
+        POOL_WAIT.observe(waited)
+        self._wait.track(waited)
+
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = direct_connection()
+                with self._lock:
+                    self.opened += 1
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_use += 1
+            self.acquired += 1
+            self.wait_total += waited
+            self.last_wait = waited
+        return _PooledConnection(conn, self)
+
+    def recent_wait(self) -> float:
+        """
+        Згладжений час очікування вільного з'єднання, секунди.
+        """
+        return self._wait.value()
+
+    def _take_idle(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, released_at = self._idle.pop()
+            if conn.closed or now - released_at > MAX_IDLE_SEC:
+                self._discard(conn)
+                continue
+            return conn
+
+    def _discard(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self.opened -= 1
+
+    def release(self, conn) -> None:
+        try:
+            reusable = not conn.closed
+            if reusable:
+                try:
+                    if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                    if conn.autocommit:
+                        conn.autocommit = False
+                except psycopg2.Error:
+                    reusable = False
+
+            if reusable:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.maxsize,
+            "opened": self.opened,
+            "in_use": self.in_use,
+            "idle": len(self._idle),
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "wait_total_sec": self.wait_total,
+            "last_wait_sec": self.last_wait,
+            "recent_wait_sec": self.recent_wait(),
+        }
+
+
+_pool_size = DB_POOL_SIZE
+_pool: ConnectionPool | None = None
+_bot_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+# без пулу: час відкриття з'єднань у connect()
+_direct_wait = _WaitTracker()
+
+
+def enable_pool(size: int) -> None:
+    """
+    Вмикає пул (викликати до першого з'єднання), size <= 0 — без пулу.
+    """
+    global _pool_size
+    _pool_size = size
+
+
+def get_pool() -> ConnectionPool | None:
+    global _pool
+    if _pool_size <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(maxsize=_pool_size)
+    return _pool
+
+
+def _get_bot_pool() -> ConnectionPool | None:
+    global _bot_pool
+    if _pool_size <= 0 or DB_BOT_POOL_SIZE <= 0:
+        return None
+    if _bot_pool is None:
+        with _pool_lock:
+            if _bot_pool is None:
+                _bot_pool = ConnectionPool(maxsize=DB_BOT_POOL_SIZE)
+    return _bot_pool
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _pool_metric(key: str):
+    def collect():
+        pool = get_pool()
+        return None if pool is None else pool.stats()[key]
+    return collect
+
+
+metrics.Gauge("db_pool_size", "Max connections in pool", _pool_metric("size"))
+metrics.Gauge("db_pool_open", "Open connections", _pool_metric("opened"))
+metrics.Gauge("db_pool_in_use", "Connections checked out", _pool_metric("in_use"))
+metrics.Gauge("db_pool_idle", "Idle connections", _pool_metric("idle"))
+metrics.Gauge("db_pool_timeouts_total", "Checkouts that timed out", _pool_metric("timeouts"), kind="counter")
+
+
+def recent_wait() -> float:
+    pool = get_pool()
+    return _direct_wait.value() if pool is None else pool.recent_wait()
+
+
+metrics.Gauge("db_pool_recent_wait_seconds", "Smoothed wait for a database connection", recent_wait)
+
+
+def connect():
+    """
+    З'єднання з пулу (або нове, якщо пул вимкнено).
+    """
+    pool = _get_bot_pool() if _in_event_loop() else get_pool()
+    if pool is None:
+        pool = get_pool()
+    if pool is None:
+        started = time.monotonic()
+        try:
+            return direct_connection()
+        finally:
+            _direct_wait.track(time.monotonic() - started)
+    return pool.acquire()
@@ -0,0 +1,223 @@
+# db_stats.py — час виконання SQL і лог повільних запитів
+"""
+Вмикається DB_QUERY_STATS=1 (config). Тоді db_pool відкриває з'єднання
+з InstrumentedConnection: кожен cursor.execute / executemany / copy_expert
+міряється і записується під стабільним ім'ям запиту.
+
+- ім'я = "<дія> <таблиця>#<хеш>" з нормалізованого SQL (пробіли згорнуті,
+  літерали -> ?), тож той самий запит з різними параметрами або з
+  різною кількістю рядків VALUES (execute_values) — одне ім'я
+- на ім'я: кількість викликів, сумарний і максимальний час, рядки
+- запити, довші за DB_SLOW_QUERY_MS, пишуться в лог "db.slow";
+  замість параметрів — лише їх типи (значення не логуються)
+- лічильники — окремі для кожного потоку (metrics.ThreadShards, без lock
+  на гарячому шляху), snapshot() зводить їх разом; на /metrics — як
+  dreamx_db_query_*
+
+Коли вимкнено, з'єднання звичайні — жодних накладних витрат.
+"""
+
+import hashlib
+import logging
+import re
+import time
+
+from psycopg2 import extensions
+
+import metrics
+from config import DB_QUERY_STATS, DB_SLOW_QUERY_MS
+
+slow_logger = logging.getLogger("db.slow")
+
+ENABLED = DB_QUERY_STATS
+SLOW_SEC = DB_SLOW_QUERY_MS / 1000
+SLOW_SQL_MAX_CHARS = 500
+# кеш "текст SQL -> ім'я"; запити з вбудованими значеннями сюди не потрапляють
+NAME_CACHE_SIZE = 2000
+
+_RE_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_RE_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_SPACES = re.compile(r"\s+")
+_RE_VALUES = re.compile(r"\b(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))*", re.I)
+_RE_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|JOIN)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([\w.]+)", re.I)
+
+_names: dict[str, tuple[str, str]] = {}
+
+
+def normalize_sql(sql) -> str:
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    elif not isinstance(sql, str):
+        # psycopg2.sql.Composed тощо
+        sql = str(sql)
+    sql = _RE_COMMENTS.sub(" ", sql)
+    sql = _RE_STRINGS.sub("?", sql)
+    sql = _RE_NUMBERS.sub("?", sql)
+    sql = _RE_SPACES.sub(" ", sql).strip()
+    return _RE_VALUES.sub(r"\1, ...", sql)
+
+
+def query_name(sql) -> tuple[str, str]:
+    """
+    SQL -> (стабільне ім'я, нормалізований текст).
+    """
+    cached = _names.get(sql) if isinstance(sql, str) else None
+    if cached is not None:
+        return cached
+
+    normalized = normalize_sql(sql)
+    verb = normalized.split(" ", 1)[0].upper() if normalized else "?"
+    if verb == "WITH":
+        verb = "CTE"
+    table = _RE_TABLE.search(normalized)
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=4).hexdigest()
+    result = (f"{verb} {table.group(1) if table else '-'}#{digest}", normalized)
+
+    if isinstance(sql, str) and len(_names) < NAME_CACHE_SIZE:
+        _names[sql] = result
+    return result
+
+
+def _redact(params) -> str:
+    """
+    Параметри -> лише типи: (int, str, list[3]).
+    """
+    if params is None:
+        return "()"
+
+    def shape(v):
+        if isinstance(v, (list, tuple)):
+            return f"{type(v).__name__}[{len(v)}]"
+        return type(v).__name__
+
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {shape(v)}" for k, v in params.items()) + "}"
+    if isinstance(params, (list, tuple)):
+        return "(" + ", ".join(shape(v) for v in params) + ")"
+    return shape(params)
+
+
+# =========================
+#   ЛІЧИЛЬНИКИ
+# =========================
+
+def _merge(into: dict, shard: dict) -> None:
+    for name, (calls, total, peak, rows) in list(shard.items()):
+        m = into.setdefault(name, [0, 0.0, 0.0, 0])
+        m[0] += calls
+        m[1] += total
+        m[2] = max(m[2], peak)
+        m[3] += rows
+
+
+_stats = metrics.ThreadShards(_merge)
+
+
+def record(sql, params, elapsed: float, rows: int) -> None:
+    name, normalized = query_name(sql)
+
+    # [calls, total_sec, max_sec, rows]; shard пише лише цей потік
+    shard = _stats.local()
+    stat = shard.get(name)
+    if stat is None:
+        stat = shard[name] = [0, 0.0, 0.0, 0]
+    stat[0] += 1
+    stat[1] += elapsed
+    if elapsed > stat[2]:
+        stat[2] = elapsed
+    if rows > 0:
+        stat[3] += rows
+
+    if elapsed >= SLOW_SEC:
+        slow_logger.warning(
+            "slow query %s: %.1f ms, rows=%s, params=%s, sql=%s",
+            name,
+            elapsed * 1000,
+            rows,
+            _redact(params),
+            normalized[:SLOW_SQL_MAX_CHARS],
+        )
+
+
+def snapshot() -> dict[str, dict]:
+    """
+    Зведена статистика по всіх потоках: ім'я -> {calls, total_ms, max_ms, rows}.
+    """
+    merged = _stats.collect()
+    return {
+        name: {
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "avg_ms": round(total * 1000 / calls, 3) if calls else 0.0,
+            "max_ms": round(peak * 1000, 3),
+            "rows": rows,
+        }
+        for name, (calls, total, peak, rows) in sorted(
+            merged.items(), key=lambda kv: kv[1][1], reverse=True
+        )
+    }
+
+
+def _query_metric(index: int):
+    def collect():
+        if not ENABLED:
+            return None
+        return {(name,): stat[index] for name, stat in _stats.collect().items()}
+    return collect
+
+
+metrics.Gauge("db_query_calls_total", "SQL statements executed", _query_metric(0), ("query",), kind="counter")
+metrics.Gauge("db_query_seconds_total", "Time spent in SQL statements", _query_metric(1), ("query",), kind="counter")
+metrics.Gauge("db_query_rows_total", "Rows returned / affected", _query_metric(3), ("query",), kind="counter")
+
+
+# =========================
+#   КУРСОР / З'ЄДНАННЯ
+# =========================
+
+class _TimedCursorMixin:
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record(query, vars, time.perf_counter() - started, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record(query, None, time.perf_counter() - started, self.rowcount)
+
+    def copy_expert(self, sql, file, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, *args, **kwargs)
+        finally:
+            record(sql, None, time.perf_counter() - started, self.rowcount)
+
+
+_cursor_classes: dict[type, type] = {}
+
+
+def _timed_cursor_class(factory: type) -> type:
+    cls = _cursor_classes.get(factory)
+    if cls is None:
+        cls = type(f"Timed{factory.__name__}", (_TimedCursorMixin, factory), {})
+        _cursor_classes[factory] = cls
+    return cls
+
+
+class InstrumentedConnection(extensions.connection):
+    """
+    Підставляє вимірюваний курсор і для conn.cursor(cursor_factory=...).
+    """
+
+    def cursor(self, *args, **kwargs):
+        if len(args) < 2:
+            factory = kwargs.get("cursor_factory") or self.cursor_factory or extensions.cursor
+            kwargs["cursor_factory"] = _timed_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
@@ -1,10 +1,18 @@
 # admin_db.py
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import base64
+import heapq
+import math
+import random
+import secrets
+import time
+from psycopg2.extras import RealDictCursor, execute_values
 from typing import List, Dict
 from datetime import datetime
 
+import db_pool
+from cache import LRUCache
+
 DATABASE_URL = os.environ.get("DATABASE_URL")  # той самий, що в основному боті
 
 if not DATABASE_URL:
@@ -12,8 +20,193 @@ if not DATABASE_URL:
 
 
 def _get_conn():
-    # просте підключення, без пулу — для початку достатньо
-    return psycopg2.connect(DATABASE_URL, sslmode="require")
+    return db_pool.connect()
+
+
+def _giveaway_table(kind: str) -> str:
+    if kind == "normal":
+        return "giveaways"
+    if kind == "promo":
+        return "promo_giveaways"
+    raise ValueError("Unknown kind")
+
+
+def init_giveaway_tables() -> None:
+    """
+    Створює службові таблиці розіграшів, якщо їх ще немає:
+      - giveaway_draws   — факт жеребкування (seed, режим, кількість учасників)
+      - giveaway_winners — переможці по місцях
+      - giveaway_participant_counters — лічильники учасників, розбиті на
+        COUNTER_STRIPES рядків, щоб сплеск участей не бив в один рядок
+      - card_tombstones + updated_at/тригери — для дельта-синхронізації стрічки
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS giveaway_draws (
+                    kind        TEXT    NOT NULL,
+                    giveaway_id BIGINT  NOT NULL,
+                    seed        BIGINT  NOT NULL,
+                    weighted    BOOLEAN NOT NULL,
+                    entrants    INTEGER NOT NULL,
+                    drawn_at    TIMESTAMP NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (kind, giveaway_id)
+                );
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS giveaway_winners (
+                    kind              TEXT    NOT NULL,
+                    giveaway_id       BIGINT  NOT NULL,
+                    place             INTEGER NOT NULL,
+                    user_id           BIGINT  NOT NULL,
+                    username_snapshot TEXT,
+                    PRIMARY KEY (kind, giveaway_id, place)
+                );
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS giveaway_participant_counters (
+                    kind        TEXT    NOT NULL,
+                    giveaway_id BIGINT  NOT NULL,
+                    stripe      SMALLINT NOT NULL,
+                    cnt         BIGINT  NOT NULL DEFAULT 0,
+                    PRIMARY KEY (kind, giveaway_id, stripe)
+                );
+                """
+            )
+            # коли страйп востаннє змінювався — щоб дельта стрічки бачила нові
+            # "participants", не чіпаючи updated_at самої карточки на кожній участі
+            cur.execute(
+                """
+                ALTER TABLE giveaway_participant_counters
+                ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+                """
+            )
+
+            # ---- дельта-синхронізація стрічки ----
+            # updated_at на карточках: оновлюється тригером при UPDATE
+            # самої карточки і при будь-якій зміні її дочірніх рядків
+            # (тригери ловлять і записи з адмін-бота)
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS card_tombstones (
+                    kind       TEXT   NOT NULL,
+                    card_id    BIGINT NOT NULL,
+                    deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS card_tombstones_deleted_at_idx
+                ON card_tombstones (deleted_at);
+                """
+            )
+            cur.execute(
+                """
+                CREATE OR REPLACE FUNCTION dreamx_touch_updated_at()
+                RETURNS trigger AS $$
+                BEGIN
+                    NEW.updated_at := NOW();
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+                """
+            )
+            cur.execute(
+                """
+                CREATE OR REPLACE FUNCTION dreamx_touch_parent()
+                RETURNS trigger AS $$
+                DECLARE
+                    r RECORD;
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+                    EXECUTE format(
+                        'UPDATE %I SET updated_at = NOW() WHERE id = ($1).%I',
+                        TG_ARGV[0], TG_ARGV[1]
+                    ) USING r;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+                """
+            )
+            cur.execute(
+                """
+                CREATE OR REPLACE FUNCTION dreamx_card_tombstone()
+                RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO card_tombstones (kind, card_id)
+                    VALUES (TG_ARGV[0], OLD.id);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+                """
+            )
+            for table, kind in (
+                ("giveaways", "normal"),
+                ("promo_giveaways", "promo"),
+                ("announcements", "announcement"),
+            ):
+                cur.execute(
+                    f"""
+                    ALTER TABLE {table}
+                    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+                    """
+                )
+                cur.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_updated_at_idx "
+                    f"ON {table} (updated_at);"
+                )
+                cur.execute(f"DROP TRIGGER IF EXISTS {table}_touch ON {table};")
+                cur.execute(
+                    f"""
+                    CREATE TRIGGER {table}_touch
+                    BEFORE UPDATE ON {table}
+                    FOR EACH ROW EXECUTE FUNCTION dreamx_touch_updated_at();
+                    """
+                )
+                cur.execute(f"DROP TRIGGER IF EXISTS {table}_tombstone ON {table};")
+                cur.execute(
+                    f"""
+                    CREATE TRIGGER {table}_tombstone
+                    AFTER DELETE ON {table}
+                    FOR EACH ROW EXECUTE FUNCTION dreamx_card_tombstone('{kind}');
+                    """
+                )
+            for child, parent, fk in (
+                ("promo_giveaway_channels", "promo_giveaways", "promo_id"),
+                ("announcement_links", "announcements", "ann_id"),
+            ):
+                cur.execute(f"DROP TRIGGER IF EXISTS {child}_touch_parent ON {child};")
+                cur.execute(
+                    f"""
+                    CREATE TRIGGER {child}_touch_parent
+                    AFTER INSERT OR UPDATE OR DELETE ON {child}
+                    FOR EACH ROW EXECUTE FUNCTION dreamx_touch_parent('{parent}', '{fk}');
+                    """
+                )
+
+            # індекси під фільтри періодів і keyset-пагінацію адмінки
+            for table in ("giveaways", "promo_giveaways"):
+                cur.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_end_at_id_idx "
+                    f"ON {table} (end_at, id);"
+                )
+                cur.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_start_at_idx "
+                    f"ON {table} (start_at);"
+                )
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS announcements_start_at_id_idx "
+                "ON announcements (start_at, id);"
+            )
+    finally:
+        conn.close()
 
 
 def create_giveaway(
@@ -64,7 +257,7 @@ def create_giveaway(
 
 def create_promo_giveaway(title, prize, prize_count, description,
                           start_dt, end_dt, channel_count, status):
-    conn = psycopg2.connect(DATABASE_URL, sslmode="require")
+    conn = _get_conn()
     cur = conn.cursor()
 
     cur.execute("""
@@ -84,7 +277,7 @@ def create_promo_giveaway(title, prize, prize_count, description,
 
 
 def add_promo_channel(promo_id, order_index, name, description, link):
-    conn = psycopg2.connect(DATABASE_URL, sslmode="require")
+    conn = _get_conn()
     cur = conn.cursor()
 
     cur.execute("""
@@ -154,37 +347,208 @@ def add_announcement_link(
     finally:
         conn.close()
 
-def get_announcements_for_admin(period: str) -> List[Dict]:
+def create_card(kind: str, card: dict) -> int:
     """
-    Повертає список оголошень для адміна за періодом.
-    period: "today" | "this_week" | "last_2_weeks"
-    Всі фільтри йдуть по даті start_at (коли оголошення стартує).
+    Створює карточку разом з дочірніми рядками однією транзакцією.
+    Якщо будь-що впало — не створюється нічого.
+
+    kind:
+      - "normal"       -> giveaways
+      - "promo"        -> promo_giveaways + card["channels"]
+                          [{name, description, link, order_index?}, ...]
+      - "announcement" -> announcements + card["links"]
+                          [{title, description, url, order_index?}, ...]
+    Решта полів — як у create_giveaway / create_promo_giveaway /
+    create_announcement (start_dt, end_dt, status, ...).
+    Дочірні рядки пишуться одним multi-row INSERT. Повертає id карточки.
     """
+    status = card.get("status", "scheduled")
+
+    conn = _get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                if kind == "normal":
+                    cur.execute(
+                        """
+                        INSERT INTO giveaways
+                            (title, prize, prize_count, description,
+                             gtype, start_at, end_at, extra_info, status)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        RETURNING id;
+                        """,
+                        (
+                            card["title"],
+                            card["prize"],
+                            card["prize_count"],
+                            card["description"],
+                            card["gtype"],
+                            card["start_dt"],
+                            card["end_dt"],
+                            card.get("extra_info"),
+                            status,
+                        ),
+                    )
+                    return cur.fetchone()[0]
+
+                if kind == "promo":
+                    channels = card.get("channels") or []
+                    cur.execute(
+                        """
+                        INSERT INTO promo_giveaways
+                            (title, prize, prize_count, description,
+                             start_at, end_at, channel_count, status)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        RETURNING id;
+                        """,
+                        (
+                            card["title"],
+                            card["prize"],
+                            card["prize_count"],
+                            card["description"],
+                            card["start_dt"],
+                            card["end_dt"],
+                            card.get("channel_count", len(channels)),
+                            status,
+                        ),
+                    )
+                    promo_id = cur.fetchone()[0]
+                    if channels:
+                        execute_values(
+                            cur,
+                            """
+                            INSERT INTO promo_giveaway_channels
+                                (promo_id, order_index, name, description, link)
+                            VALUES %s;
+                            """,
+                            [
+                                (
+                                    promo_id,
+                                    ch.get("order_index", i),
+                                    ch["name"],
+                                    ch.get("description"),
+                                    ch["link"],
+                                )
+                                for i, ch in enumerate(channels, start=1)
+                            ],
+                        )
+                    return promo_id
+
+                if kind == "announcement":
+                    links = card.get("links") or []
+                    cur.execute(
+                        """
+                        INSERT INTO announcements
+                            (title, message, extra_info, start_at, end_at, status)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        RETURNING id;
+                        """,
+                        (
+                            card["title"],
+                            card["message"],
+                            card.get("extra_info"),
+                            card["start_dt"],
+                            card["end_dt"],
+                            status,
+                        ),
+                    )
+                    ann_id = cur.fetchone()[0]
+                    if links:
+                        execute_values(
+                            cur,
+                            """
+                            INSERT INTO announcement_links
+                                (ann_id, order_index, title, description, url)
+                            VALUES %s;
+                            """,
+                            [
+                                (
+                                    ann_id,
+                                    link.get("order_index", i),
+                                    link["title"],
+                                    link.get("description"),
+                                    link["url"],
+                                )
+                                for i, link in enumerate(links, start=1)
+                            ],
+                        )
+                    return ann_id
+
+                raise ValueError("Unknown kind")
+    finally:
+        conn.close()
+
 
+def _period_filter(column: str, period: str) -> str:
+    """
+    Фільтр періоду як напіввідкритий діапазон по самій колонці
+    (без DATE(column)), щоб працював індекс.
+    period: "today" | "this_week" | "last_2_weeks"
+    """
     if period == "today":
-        where = "DATE(start_at) = CURRENT_DATE"
-    elif period == "this_week":
+        return (
+            f"{column} >= CURRENT_DATE "
+            f"AND {column} < CURRENT_DATE + interval '1 day'"
+        )
+    if period == "this_week":
+        # тиждень з понеділка по неділю
+        return (
+            f"{column} >= date_trunc('week', CURRENT_DATE) "
+            f"AND {column} < date_trunc('week', CURRENT_DATE) + interval '7 days'"
+        )
+    if period == "last_2_weeks":
+        return f"{column} >= CURRENT_DATE - interval '14 days'"
+    raise ValueError("Unknown period")
+
+
+def _keyset_page(table: str, order_col: str, after_id: int | None, limit: int | None):
+    """
+    Keyset-пагінація по (order_col, id): наступна сторінка після рядка after_id.
+    Повертає (sql_where, sql_tail, params).
+    """
+    where = ""
+    params: list = []
+    if after_id is not None:
         where = (
-            "DATE(start_at) BETWEEN "
-            "date_trunc('week', CURRENT_DATE)::date "
-            "AND (date_trunc('week', CURRENT_DATE) + interval '6 days')::date"
+            f" AND ({order_col}, id) > "
+            f"(SELECT {order_col}, id FROM {table} WHERE id = %s)"
         )
-    elif period == "last_2_weeks":
-        where = "DATE(start_at) >= (CURRENT_DATE - interval '14 days')"
-    else:
-        raise ValueError("Unknown period")
+        params.append(after_id)
+
+    tail = f"ORDER BY {order_col} ASC, id ASC"
+    if limit is not None:
+        tail += " LIMIT %s"
+        params.append(limit)
+    return where, tail, params
+
+
+def get_announcements_for_admin(
+    period: str,
+    after_id: int | None = None,
+    limit: int | None = None,
+) -> List[Dict]:
+    """
+    Повертає список оголошень для адміна за періодом.
+    period: "today" | "this_week" | "last_2_weeks"
+    Всі фільтри йдуть по даті start_at (коли оголошення стартує).
+
+    Пагінація: limit — розмір сторінки, after_id — id останнього
+    оголошення з попередньої сторінки.
+    """
+    where = _period_filter("start_at", period)
+    page_where, tail, params = _keyset_page("announcements", "start_at", after_id, limit)
 
     sql = f"""
         SELECT id, title, message, extra_info, start_at, end_at
         FROM announcements
-        WHERE {where}
-        ORDER BY start_at ASC;
+        WHERE {where}{page_where}
+        {tail};
     """
 
     conn = _get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute(sql)
+            cur.execute(sql, params)
             rows = cur.fetchall()
     finally:
         conn.close()
@@ -228,45 +592,40 @@ def delete_announcement(ann_id: int) -> bool:
         conn.close()
 
 
-def get_giveaways_for_admin(kind: str, period: str) -> List[Dict]:
+def get_giveaways_for_admin(
+    kind: str,
+    period: str,
+    after_id: int | None = None,
+    limit: int | None = None,
+) -> List[Dict]:
     """
     kind: "normal" або "promo"
     period: "today" | "this_week" | "last_2_weeks"
-    """
 
-    if kind == "normal":
-        table = "giveaways"
-    elif kind == "promo":
-        table = "promo_giveaways"
-    else:
-        raise ValueError("Unknown kind")
+    Пагінація: limit — розмір сторінки, after_id — id останнього
+    розіграшу з попередньої сторінки.
+    """
+    table = _giveaway_table(kind)
 
-    if period == "today":
-        where = "DATE(end_at) = CURRENT_DATE"
-    elif period == "this_week":
-        # тиждень з понеділка по неділю
-        where = (
-            "DATE(end_at) BETWEEN "
-            "date_trunc('week', CURRENT_DATE)::date "
-            "AND (date_trunc('week', CURRENT_DATE) + interval '6 days')::date"
-        )
-    elif period == "last_2_weeks":
+    if period == "last_2_weeks":
         # за датою СТАРТУ (як дата створення) за останні 14 днів
-        where = "DATE(start_at) >= (CURRENT_DATE - interval '14 days')"
+        where = _period_filter("start_at", period)
     else:
-        raise ValueError("Unknown period")
+        where = _period_filter("end_at", period)
+
+    page_where, tail, params = _keyset_page(table, "end_at", after_id, limit)
 
     sql = f"""
         SELECT id, title, prize, prize_count, description, start_at, end_at
         FROM {table}
-        WHERE {where}
-        ORDER BY end_at ASC;
+        WHERE {where}{page_where}
+        {tail};
     """
 
     conn = _get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute(sql)
+            cur.execute(sql, params)
             rows = cur.fetchall()
     finally:
         conn.close()
@@ -308,7 +667,15 @@ def delete_giveaway(kind: str, giveaway_id: int) -> bool:
                     f"DELETE FROM {table} WHERE id = %s",
                     (giveaway_id,)
                 )
-                return cur.rowcount > 0
+                deleted = cur.rowcount > 0
+                cur.execute(
+                    """
+                    DELETE FROM giveaway_participant_counters
+                    WHERE kind = %s AND giveaway_id = %s
+                    """,
+                    (kind, giveaway_id)
+                )
+                return deleted
     finally:
         conn.close()
 
@@ -316,142 +683,430 @@ def delete_giveaway(kind: str, giveaway_id: int) -> bool:
 # ======== Отримати активні функціі ================
 
 
-def get_active_giveaways() -> list[dict]:
+def _participants_sql(kind: str, id_expr: str) -> str:
     """
-    Активні звичайні розіграші:
-    start_at <= NOW < end_at
+    Підзапит "скільки учасників" для SELECT карточки: сума страйпів
+    лічильника по PK, без COUNT(*) по giveaway_players.
+    """
+    return f"""(
+               SELECT COALESCE(SUM(c.cnt), 0)::bigint
+               FROM giveaway_participant_counters c
+               WHERE c.kind = '{kind}' AND c.giveaway_id = {id_expr}
+           ) AS participants"""
+
+
+def _since_filter(kind: str, since: float | None, with_counters: bool) -> tuple[str, tuple]:
     """
-    sql = """
-        SELECT id, title, prize, prize_count, description,
-               gtype, extra_info, start_at, end_at
-        FROM giveaways
+    Для дельта-синхронізації: лише карточки, змінені після since
+    (epoch-секунди) або які стали активними після since.
+    with_counters — також ті, в яких після since змінилась кількість
+    учасників (updated_at страйпів лічильника, пошук по PK).
+    """
+    if since is None:
+        return "", ()
+    if not with_counters or "participants" not in _CARD_FIELDS[kind]:
+        return (
+            """
+          AND (updated_at > to_timestamp(%s) OR start_at > to_timestamp(%s))""",
+            (since, since),
+        )
+    return (
+        f"""
+          AND (updated_at > to_timestamp(%s) OR start_at > to_timestamp(%s)
+               OR EXISTS (
+                   SELECT 1 FROM giveaway_participant_counters c
+                   WHERE c.kind = '{kind}' AND c.giveaway_id = {_CARD_TABLES[kind]}.id
+                     AND c.updated_at > to_timestamp(%s)
+               ))""",
+        (since, since, since),
+    )
+
+
+# Які поля є в карточці кожного типу (порядок = порядок у SELECT).
+# "participants" — підзапит до лічильників, "channels" / "links" — дочірні рядки.
+CARD_KINDS = ("normal", "promo", "announcement")
+
+_CARD_TABLES = {
+    "normal": "giveaways",
+    "promo": "promo_giveaways",
+    "announcement": "announcements",
+}
+
+_CARD_FIELDS = {
+    "normal": (
+        "id", "title", "prize", "prize_count", "description",
+        "gtype", "extra_info", "start_at", "end_at", "participants",
+    ),
+    "promo": (
+        "id", "title", "prize", "prize_count", "description",
+        "start_at", "end_at", "channel_count", "participants", "channels",
+    ),
+    "announcement": (
+        "id", "title", "message", "extra_info", "start_at", "end_at", "links",
+    ),
+}
+
+# без цих полів не працює сортування і курсор
+_CARD_REQUIRED_FIELDS = ("id", "start_at")
+
+
+def _after_filter(kind: str, after: tuple | None) -> tuple[str, tuple]:
+    """
+    Keyset-умова "після карточки after = (start_at, kind, id)" для таблиці kind.
+    Глобальний порядок стрічки — (start_at, порядок kind у CARD_KINDS, id).
+    """
+    if after is None:
+        return "", ()
+
+    after_start, after_kind, after_id = after
+    rank = CARD_KINDS.index(kind)
+    after_rank = CARD_KINDS.index(after_kind)
+
+    if rank > after_rank:
+        return "\n          AND start_at >= %s", (after_start,)
+    if rank < after_rank:
+        return "\n          AND start_at > %s", (after_start,)
+    return "\n          AND (start_at, id) > (%s, %s)", (after_start, after_id)
+
+
+def _select_active(
+    cur,
+    kind: str,
+    since: float | None = None,
+    fields: set[str] | None = None,
+    after: tuple | None = None,
+    limit: int | None = None,
+    order_by: str = "start_at ASC, id ASC",
+) -> list[dict]:
+    """
+    Активні карточки одного типу (start_at <= NOW < end_at) одним запитом.
+    fields  — які поля віддати (None — всі); проєкція йде прямо в SELECT,
+              дочірні рядки читаються лише якщо їх попросили, і одним
+              запитом на всі карточки.
+    since   — лише змінені після since (дельта-синхронізація); якщо
+              віддаємо participants — і ті, де змінилась кількість учасників.
+    after / limit — keyset-пагінація.
+    """
+    table = _CARD_TABLES[kind]
+    wanted = [
+        f for f in _CARD_FIELDS[kind]
+        if fields is None or f in fields or f in _CARD_REQUIRED_FIELDS
+    ]
+
+    columns = []
+    for f in wanted:
+        if f == "participants":
+            columns.append(_participants_sql(kind, f"{table}.id"))
+        elif f not in ("channels", "links"):
+            columns.append(f)
+
+    since_sql, since_params = _since_filter(kind, since, "participants" in wanted)
+    after_sql, after_params = _after_filter(kind, after)
+    limit_sql = ""
+    limit_params: tuple = ()
+    if limit is not None:
+        limit_sql = "\n        LIMIT %s"
+        limit_params = (limit,)
+
+    sql = f"""
+        SELECT {", ".join(columns)}
+        FROM {table}
         WHERE start_at <= NOW()
-          AND end_at   > NOW()
-        ORDER BY end_at ASC;
+          AND end_at   > NOW(){since_sql}{after_sql}
+        ORDER BY {order_by}{limit_sql};
     """
+    cur.execute(sql, since_params + after_params + limit_params)
+    rows = [dict(r) for r in cur.fetchall()]
+
+    ids = [r["id"] for r in rows]
+    if "channels" in wanted:
+        by_parent = _select_children(
+            cur,
+            """
+            SELECT promo_id AS parent_id, order_index, name, description, link
+            FROM promo_giveaway_channels
+            WHERE promo_id = ANY(%s)
+            ORDER BY promo_id, order_index ASC;
+            """,
+            ids,
+        )
+        for r in rows:
+            r["channels"] = by_parent.get(r["id"], [])
+    if "links" in wanted:
+        by_parent = _select_children(
+            cur,
+            """
+            SELECT ann_id AS parent_id, order_index, title, description, url
+            FROM announcement_links
+            WHERE ann_id = ANY(%s)
+            ORDER BY ann_id, order_index ASC;
+            """,
+            ids,
+        )
+        for r in rows:
+            r["links"] = by_parent.get(r["id"], [])
+
+    return rows
+
+
+def _select_children(cur, sql: str, parent_ids: list[int]) -> dict[int, list[dict]]:
+    if not parent_ids:
+        return {}
+    cur.execute(sql, (parent_ids,))
+    by_parent: dict[int, list[dict]] = {}
+    for r in cur.fetchall():
+        item = dict(r)
+        by_parent.setdefault(item.pop("parent_id"), []).append(item)
+    return by_parent
+
 
+def _active(kind: str, since: float | None, order_by: str) -> list[dict]:
     conn = _get_conn()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql)
-            rows = cur.fetchall()
-        return [dict(r) for r in rows]
+            return _select_active(cur, kind, since=since, order_by=order_by)
     finally:
         conn.close()
 
 
-def get_active_promo_giveaways() -> list[dict]:
+def get_active_giveaways(since: float | None = None) -> list[dict]:
+    """
+    Активні звичайні розіграші:
+    start_at <= NOW < end_at
+    since — лише змінені після цього моменту (див. get_feed_delta).
+    """
+    return _active("normal", since, "end_at ASC")
+
+
+def get_active_promo_giveaways(since: float | None = None) -> list[dict]:
     """
     Активні рекламні розіграші з каналами.
     """
-    sql_main = """
-        SELECT id, title, prize, prize_count, description,
-               start_at, end_at, channel_count
-        FROM promo_giveaways
-        WHERE start_at <= NOW()
-          AND end_at   > NOW()
-        ORDER BY end_at ASC;
+    return _active("promo", since, "end_at ASC")
+
+
+def get_active_announcements(since: float | None = None) -> list[dict]:
     """
+    Активні оголошення з посиланнями.
+    """
+    return _active("announcement", since, "start_at ASC")
+
+
+def _card_sort_key(card: dict):
+    return (card["start_at"], CARD_KINDS.index(card["kind"]), card["id"])
 
+
+def encode_cards_cursor(card: dict) -> str:
+    raw = f"{card['start_at'].isoformat()}|{card['kind']}|{card['id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cards_cursor(cursor: str) -> tuple:
+    """
+    Курсор -> (start_at, kind, id). Некоректний курсор — ValueError.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        start_raw, kind, id_raw = raw.split("|")
+        after = (datetime.fromisoformat(start_raw), kind, int(id_raw))
+    except Exception:
+        raise ValueError("bad_cursor")
+    if kind not in CARD_KINDS:
+        raise ValueError("bad_cursor")
+    return after
+
+
+def get_cards_page(
+    kinds: list[str] | None = None,
+    fields: set[str] | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    since: float | None = None,
+) -> dict:
+    """
+    Сторінка стрічки активних карточок.
+    kinds  — які типи ("normal" / "promo" / "announcement"), None — всі
+    fields — проєкція полів (id, kind, start_at віддаються завжди)
+    limit / cursor — keyset-пагінація по (start_at, kind, id)
+    Фільтри, проєкція і LIMIT виконуються в SQL: кожна таблиця віддає
+    не більше limit + 1 рядків, далі — злиття вже відсортованих списків.
+    Повертає {"cards": [...], "next_cursor": str | None}.
+    """
+    kinds = list(kinds or CARD_KINDS)
+    for k in kinds:
+        if k not in CARD_KINDS:
+            raise ValueError("Unknown kind")
+    after = decode_cards_cursor(cursor) if cursor else None
+    per_kind_limit = limit + 1 if limit is not None else None
+
+    cards: list[dict] = []
     conn = _get_conn()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql_main)
-            promos = [dict(r) for r in cur.fetchall()]
-
-            # добираємо канали для кожного promo
-            for p in promos:
-                cur.execute(
-                    """
-                    SELECT order_index, name, description, link
-                    FROM promo_giveaway_channels
-                    WHERE promo_id = %s
-                    ORDER BY order_index ASC;
-                    """,
-                    (p["id"],)
-                )
-                ch_rows = cur.fetchall()
-                p["channels"] = [dict(ch) for ch in ch_rows]
-
-        return promos
+            for kind in kinds:
+                for item in _select_active(
+                    cur,
+                    kind,
+                    since=since,
+                    fields=fields,
+                    after=after,
+                    limit=per_kind_limit,
+                ):
+                    item["kind"] = kind
+                    cards.append(item)
     finally:
         conn.close()
 
+    cards.sort(key=_card_sort_key)
 
-def get_active_announcements() -> list[dict]:
-    """
-    Активні оголошення з посиланнями.
+    next_cursor = None
+    if limit is not None and len(cards) > limit:
+        cards = cards[:limit]
+        next_cursor = encode_cards_cursor(cards[-1])
+
+    return {"cards": cards, "next_cursor": next_cursor}
+
+
+def get_active_cards(since: float | None = None) -> list[dict]:
     """
-    sql_main = """
-        SELECT id, title, message, extra_info, start_at, end_at
-        FROM announcements
-        WHERE start_at <= NOW()
-          AND end_at   > NOW()
-        ORDER BY start_at ASC;
+    Єдиний список всіх активних карточок для фронта.
+    Об'єднує:
+    - звичайні розіграші (giveaways)  -> kind = "normal"
+    - рекламні розіграші (promo_giveaways) -> kind = "promo"
+    - оголошення (announcements) -> kind = "announcement"
+    since — лише змінені після цього моменту (epoch-секунди).
     """
+    return get_cards_page(since=since)["cards"]
+
 
+# скільки зберігаємо "надгробки" видалених карточок
+TOMBSTONE_RETENTION_DAYS = 14
+# перекриття курсора: транзакції, що комітяться трохи пізніше за свій
+# updated_at, потраплять у наступну дельту (клієнт робить upsert по id)
+FEED_CURSOR_OVERLAP_SEC = 5
+
+
+def get_feed_delta(
+    since: float | None,
+    kinds: list[str] | None = None,
+    fields: set[str] | None = None,
+) -> dict:
+    """
+    Дельта-синхронізація стрічки карточок.
+
+    since — курсор з попередньої відповіді (epoch-секунди) або None.
+    kinds / fields — як у get_cards_page (фільтр типів і проєкція полів).
+    Повертає:
+      {
+        "full":    True, якщо віддано всю стрічку (без since або він застарий),
+        "cards":   активні карточки, створені/змінені/стартувавші після since
+                   (і ті, де змінилась кількість учасників, якщо є participants),
+        "removed": [{"kind", "id"}] — закінчились або видалені після since,
+        "cursor":  курсор для наступного запиту
+      }
+    """
     conn = _get_conn()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql_main)
-            anns = [dict(r) for r in cur.fetchall()]
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT EXTRACT(EPOCH FROM NOW())::float,
+                       EXTRACT(EPOCH FROM NOW() - make_interval(days => %s))::float;
+                """,
+                (TOMBSTONE_RETENTION_DAYS,)
+            )
+            now, oldest = cur.fetchone()
 
-            for a in anns:
+            if since is not None and since < oldest:
+                since = None
+
+            removed: list[dict] = []
+            if since is not None:
                 cur.execute(
                     """
-                    SELECT order_index, title, description, url
-                    FROM announcement_links
-                    WHERE ann_id = %s
-                    ORDER BY order_index ASC;
+                    SELECT 'normal', id FROM giveaways
+                    WHERE end_at > to_timestamp(%s) AND end_at <= NOW()
+                    UNION ALL
+                    SELECT 'promo', id FROM promo_giveaways
+                    WHERE end_at > to_timestamp(%s) AND end_at <= NOW()
+                    UNION ALL
+                    SELECT 'announcement', id FROM announcements
+                    WHERE end_at > to_timestamp(%s) AND end_at <= NOW()
+                    UNION ALL
+                    SELECT kind, card_id FROM card_tombstones
+                    WHERE deleted_at > to_timestamp(%s);
                     """,
-                    (a["id"],)
+                    (since, since, since, since)
                 )
-                links = cur.fetchall()
-                a["links"] = [dict(l) for l in links]
-
-        return anns
+                removed = [
+                    {"kind": k, "id": i}
+                    for k, i in cur.fetchall()
+                    if kinds is None or k in kinds
+                ]
     finally:
         conn.close()
 
+    return {
+        "full": since is None,
+        "cards": get_cards_page(kinds=kinds, fields=fields, since=since)["cards"],
+        "removed": removed,
+        "cursor": now - FEED_CURSOR_OVERLAP_SEC,
+    }
+
 
-def get_active_cards() -> list[dict]:
+def purge_card_tombstones() -> int:
     """
-    Єдиний список всіх активних карточок для фронта.
-    Об'єднує:
-    - звичайні розіграші (giveaways)  -> kind = "normal"
-    - рекламні розіграші (promo_giveaways) -> kind = "promo"
-    - оголошення (announcements) -> kind = "announcement"
+    Видаляє "надгробки" старші за TOMBSTONE_RETENTION_DAYS.
+    Клієнт з курсором, старшим за це, отримає повну стрічку.
     """
-    cards: list[dict] = []
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM card_tombstones
+                WHERE deleted_at < NOW() - make_interval(days => %s);
+                """,
+                (TOMBSTONE_RETENTION_DAYS,)
+            )
+            return cur.rowcount
+    finally:
+        conn.close()
 
-    # 1) Звичайні розіграші
-    for g in get_active_giveaways():
-        item = dict(g)
-        item["kind"] = "normal"
-        cards.append(item)
 
-    # 2) Рекламні розіграші
-    for p in get_active_promo_giveaways():
-        item = dict(p)
-        item["kind"] = "promo"
-        cards.append(item)
 
-    # 3) Оголошення
-    for a in get_active_announcements():
-        item = dict(a)
-        item["kind"] = "announcement"
-        cards.append(item)
 
-    # Можна посортувати за start_at (якщо є), інакше по end_at
-    def sort_key(x: dict):
-        return x.get("start_at") or x.get("end_at") or datetime.max
 
-    cards.sort(key=sort_key)
+def get_promo_channel_links(promo_id: int) -> list[str]:
+    """
+    Посилання на канали, на які треба підписатись для участі в promo.
+    """
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT link
+                FROM promo_giveaway_channels
+                WHERE promo_id = %s
+                ORDER BY order_index ASC;
+                """,
+                (promo_id,)
+            )
+            return [r[0] for r in cur.fetchall()]
+    finally:
+        conn.close()
 
-    return cards
 
+# на скільки рядків розбитий лічильник учасників одного розіграшу
+COUNTER_STRIPES = 16
 
+# кеш "в яких активних розіграшах я вже беру участь":
+# user_id -> {(kind, giveaway_id): expires_at (time.time(), = end_at розіграшу)}
+JOINED_CACHE_SIZE = 50_000
+JOINED_CACHE_TTL_SEC = 300
 
+_joined_cache = LRUCache(maxsize=JOINED_CACHE_SIZE, ttl=JOINED_CACHE_TTL_SEC, name="joined_giveaways")
 
 
 def add_giveaway_player(
@@ -460,7 +1115,7 @@ def add_giveaway_player(
     username_snapshot: str | None,
     points_in_giveaway: int = 1,
     kind: str = "normal",
-) -> None:
+) -> bool:
     """
     Додає участь користувача в розіграші.
 
@@ -468,11 +1123,53 @@ def add_giveaway_player(
       - "normal"  -> таблиця giveaways
       - "promo"   -> таблиця promo_giveaways
     points_in_giveaway – завжди 1 при вході по кнопці.
+
+    Повертає True, якщо участь додано зараз (False — вже брав участь).
     """
+    entry = {
+        "kind": kind,
+        "giveaway_id": giveaway_id,
+        "user_id": user_id,
+        "username_snapshot": username_snapshot,
+        "points_in_giveaway": points_in_giveaway,
+    }
+    return (kind, giveaway_id, user_id) in add_giveaway_players([entry])
+
+
+def add_giveaway_players(entries: list[dict]) -> set[tuple[str, int, int]]:
+    """
+    Пачка участей одним multi-row INSERT ... ON CONFLICT DO NOTHING.
+    Елемент: {kind, giveaway_id, user_id, username_snapshot, points_in_giveaway}.
+
+    Повертає множину (kind, giveaway_id, user_id), які вставлено саме зараз;
+    решта — "вже брав участь". Кеш участі юзерів оновлюється на місці.
+
+    Рядки і лічильники пишуться в порядку ключів, щоб паралельні пачки
+    з інших процесів брали блокування в однаковому порядку (без deadlock).
+    """
+    rows = {}
+    for e in entries:
+        _giveaway_table(e["kind"])
+        key = (e["kind"], e["giveaway_id"], e["user_id"])
+        rows.setdefault(key, (
+            e["giveaway_id"],
+            e["user_id"],
+            e.get("username_snapshot"),
+            e.get("points_in_giveaway", 1),
+            e["kind"],
+        ))
+    if not rows:
+        return set()
+
+    ids_by_kind: dict[str, set[int]] = {}
+    for kind, gid, _ in rows:
+        ids_by_kind.setdefault(kind, set()).add(gid)
+
     conn = _get_conn()
     try:
         with conn, conn.cursor() as cur:
-            cur.execute(
+            inserted = execute_values(
+                cur,
                 """
                 INSERT INTO giveaway_players (
                     giveaway_id,
@@ -481,36 +1178,109 @@ def add_giveaway_player(
                     points_in_giveaway,
                     kind
                 )
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (kind, giveaway_id, user_id) DO NOTHING;
+                VALUES %s
+                ON CONFLICT (kind, giveaway_id, user_id) DO NOTHING
+                RETURNING kind, giveaway_id, user_id;
                 """,
-                (giveaway_id, user_id, username_snapshot, points_in_giveaway, kind)
+                [rows[key] for key in sorted(rows)],
+                fetch=True,
             )
+
+            # лічильники учасників: +N у випадковий страйп
+            added: dict[tuple[str, int], int] = {}
+            for kind, gid, _ in inserted:
+                added[(kind, gid)] = added.get((kind, gid), 0) + 1
+            if added:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO giveaway_participant_counters AS c
+                        (kind, giveaway_id, stripe, cnt)
+                    VALUES %s
+                    ON CONFLICT (kind, giveaway_id, stripe)
+                    DO UPDATE SET cnt = c.cnt + EXCLUDED.cnt, updated_at = NOW();
+                    """,
+                    sorted(
+                        (kind, gid, random.randrange(COUNTER_STRIPES), n)
+                        for (kind, gid), n in added.items()
+                    ),
+                )
+
+            # скільки ще житимуть розіграші — для кешу участі
+            seconds_left: dict[tuple[str, int], float] = {}
+            for kind, ids in ids_by_kind.items():
+                cur.execute(
+                    f"""
+                    SELECT id, EXTRACT(EPOCH FROM (end_at - NOW()))::float
+                    FROM {_giveaway_table(kind)}
+                    WHERE id = ANY(%s);
+                    """,
+                    (list(ids),)
+                )
+                for gid, left in cur.fetchall():
+                    seconds_left[(kind, gid)] = left
     finally:
         conn.close()
 
+    now = time.time()
+    for kind, gid, user_id in rows:
+        left = seconds_left.get((kind, gid))
+        if left is not None and left > 0:
+            _joined_cache.update(
+                user_id,
+                lambda joined, k=(kind, gid), exp=now + left: {**joined, k: exp},
+            )
+
+    return {tuple(r) for r in inserted}
+
 
 def get_joined_giveaways_for_user(user_id: int) -> list[dict]:
     """
-    Повертає список всіх розіграшів, де юзер вже бере участь.
+    Повертає список активних розіграшів, де юзер вже бере участь.
     Формат елемента:
       { "giveaway_id": int, "kind": "normal" | "promo" }
-    """
-    sql = """
-        SELECT giveaway_id, kind
-        FROM giveaway_players
-        WHERE user_id = %s;
-    """
-
-    conn = _get_conn()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql, (user_id,))
-            rows = cur.fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
 
+    Відповідь кешується на юзера (LRU); розіграші, що вже закінчились,
+    випадають з кешованого списку самі.
+    """
+    joined = _joined_cache.get(user_id)
+
+    if joined is None:
+        sql = """
+            SELECT gp.giveaway_id,
+                   gp.kind,
+                   EXTRACT(EPOCH FROM (COALESCE(g.end_at, p.end_at) - NOW()))::float
+                       AS seconds_left
+            FROM giveaway_players gp
+            LEFT JOIN giveaways g
+              ON gp.kind = 'normal' AND g.id = gp.giveaway_id
+            LEFT JOIN promo_giveaways p
+              ON gp.kind = 'promo' AND p.id = gp.giveaway_id
+            WHERE gp.user_id = %s
+              AND COALESCE(g.end_at, p.end_at) > NOW();
+        """
+
+        conn = _get_conn()
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(sql, (user_id,))
+                rows = cur.fetchall()
+        finally:
+            conn.close()
+
+        now = time.time()
+        joined = {
+            (r["kind"], r["giveaway_id"]): now + r["seconds_left"]
+            for r in rows
+        }
+        _joined_cache.set(user_id, joined)
+
+    now = time.time()
+    return [
+        {"giveaway_id": gid, "kind": kind}
+        for (kind, gid), expires_at in joined.items()
+        if expires_at > now
+    ]
 
 
 def get_user_giveaway_ids(user_id: int) -> list[int]:
@@ -535,3 +1305,229 @@ def get_user_giveaway_ids(user_id: int) -> list[int]:
         conn.close()
 
 
+# ======== Жеребкування переможців ================
+
+DRAW_FETCH_SIZE = 10_000
+
+
+def _get_draw(cur, kind: str, giveaway_id: int) -> dict | None:
+    cur.execute(
+        """
+        SELECT kind, giveaway_id, seed, weighted, entrants, drawn_at
+        FROM giveaway_draws
+        WHERE kind = %s AND giveaway_id = %s
+        """,
+        (kind, giveaway_id),
+    )
+    draw = cur.fetchone()
+    if not draw:
+        return None
+
+    cur.execute(
+        """
+        SELECT place, user_id, username_snapshot
+        FROM giveaway_winners
+        WHERE kind = %s AND giveaway_id = %s
+        ORDER BY place
+        """,
+        (kind, giveaway_id),
+    )
+    draw = dict(draw)
+    draw["winners"] = [dict(r) for r in cur.fetchall()]
+    return draw
+
+
+def draw_giveaway_winners(
+    kind: str,
+    giveaway_id: int,
+    weighted: bool = False,
+    seed: int | None = None,
+) -> dict:
+    """
+    Обирає prize_count різних переможців розіграшу і записує їх
+    у giveaway_winners. Повторний виклик повертає вже збережений результат.
+
+    weighted=True — шанс пропорційний points_in_giveaway
+    (вибірка без повернення, ключ u ** (1 / w), Efraimidis–Spirakis).
+
+    Учасники читаються server-side курсором по (user_id), у пам'яті —
+    лише купа з prize_count кандидатів. Той самий seed на тих самих
+    учасниках дає той самий результат.
+    """
+    table = _giveaway_table(kind)
+
+    conn = _get_conn()
+    try:
+        with conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"""
+                    SELECT prize_count, end_at <= NOW() AS ended
+                    FROM {table}
+                    WHERE id = %s
+                    FOR UPDATE
+                    """,
+                    (giveaway_id,),
+                )
+                g = cur.fetchone()
+                if not g:
+                    raise ValueError("giveaway_not_found")
+
+                existing = _get_draw(cur, kind, giveaway_id)
+                if existing:
+                    return existing
+
+                if not g["ended"]:
+                    raise ValueError("giveaway_not_finished")
+
+            if seed is None:
+                seed = secrets.randbits(63)
+            rng = random.Random(seed)
+            k = max(int(g["prize_count"] or 0), 0)
+
+            # min-купа з k найбільших ключів: (key, user_id, username)
+            heap: list[tuple[float, int, str | None]] = []
+            entrants = 0
+
+            with conn.cursor(name=f"draw_{kind}_{giveaway_id}") as stream:
+                stream.itersize = DRAW_FETCH_SIZE
+                stream.execute(
+                    """
+                    SELECT user_id, username_snapshot, points_in_giveaway
+                    FROM giveaway_players
+                    WHERE kind = %s AND giveaway_id = %s
+                    ORDER BY user_id
+                    """,
+                    (kind, giveaway_id),
+                )
+                for user_id, username, points in stream:
+                    entrants += 1
+                    u = rng.random()
+                    if weighted:
+                        if not points or points <= 0:
+                            continue
+                        # log(u ** (1/w)) — без underflow на великих w
+                        key = math.log(u) / points if u > 0 else -math.inf
+                    else:
+                        key = u
+
+                    item = (key, user_id, username)
+                    if len(heap) < k:
+                        heapq.heappush(heap, item)
+                    elif k and key > heap[0][0]:
+                        heapq.heapreplace(heap, item)
+
+            winners = sorted(heap, reverse=True)
+
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    INSERT INTO giveaway_draws (kind, giveaway_id, seed, weighted, entrants)
+                    VALUES (%s, %s, %s, %s, %s)
+                    """,
+                    (kind, giveaway_id, seed, weighted, entrants),
+                )
+                if winners:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO giveaway_winners
+                            (kind, giveaway_id, place, user_id, username_snapshot)
+                        VALUES %s
+                        """,
+                        [
+                            (kind, giveaway_id, place, user_id, username)
+                            for place, (_, user_id, username) in enumerate(winners, start=1)
+                        ],
+                    )
+                return _get_draw(cur, kind, giveaway_id)
+    finally:
+        conn.close()
+
+
+# ======== Лічильники учасників ================
+
+def reconcile_participant_counters(recent_days: int = 1) -> int:
+    """
+    Виправляє дрейф лічильників учасників для активних розіграшів
+    і тих, що закінчились за останні recent_days днів.
+
+    COUNT(*) і сума страйпів читаються одним запитом (один снепшот;
+    участь і інкремент комітяться разом), різниця додається в страйп 0 —
+    тож паралельні участі не губляться і блокування не потрібні.
+    Повертає кількість виправлених розіграшів.
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                WITH targets AS (
+                    SELECT 'normal' AS kind, id AS giveaway_id
+                    FROM giveaways
+                    WHERE start_at <= NOW()
+                      AND end_at > NOW() - make_interval(days => %s)
+                    UNION ALL
+                    SELECT 'promo', id
+                    FROM promo_giveaways
+                    WHERE start_at <= NOW()
+                      AND end_at > NOW() - make_interval(days => %s)
+                ),
+                drift AS (
+                    SELECT t.kind, t.giveaway_id,
+                           (SELECT COUNT(*) FROM giveaway_players gp
+                            WHERE gp.kind = t.kind AND gp.giveaway_id = t.giveaway_id)
+                         - (SELECT COALESCE(SUM(c.cnt), 0) FROM giveaway_participant_counters c
+                            WHERE c.kind = t.kind AND c.giveaway_id = t.giveaway_id)
+                           AS delta
+                    FROM targets t
+                )
+                INSERT INTO giveaway_participant_counters AS c
+                    (kind, giveaway_id, stripe, cnt)
+                SELECT kind, giveaway_id, 0, delta
+                FROM drift
+                WHERE delta <> 0
+                ON CONFLICT (kind, giveaway_id, stripe)
+                DO UPDATE SET cnt = c.cnt + EXCLUDED.cnt, updated_at = NOW();
+                """,
+                (recent_days, recent_days)
+            )
+            return cur.rowcount
+    finally:
+        conn.close()
+
+
+# ======== Експорт учасників ================
+
+def export_giveaway_participants_csv(kind: str, giveaway_id: int, out) -> None:
+    """
+    Пише всіх учасників розіграшу (giveaway_players + players) у out як CSV
+    з заголовком. Використовує COPY ... TO STDOUT: Postgres віддає дані
+    шматками, які одразу йдуть у out.write() — пам'ять стала при будь-якій
+    кількості рядків.
+    """
+    _giveaway_table(kind)
+
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
+            query = cur.mogrify(
+                """
+                COPY (
+                    SELECT gp.user_id,
+                           gp.username_snapshot,
+                           p.user_name,
+                           p.first_name,
+                           gp.points_in_giveaway,
+                           p.points
+                    FROM giveaway_players gp
+                    LEFT JOIN players p ON p.user_id = gp.user_id
+                    WHERE gp.kind = %s AND gp.giveaway_id = %s
+                    ORDER BY gp.user_id
+                ) TO STDOUT WITH (FORMAT csv, HEADER true)
+                """,
+                (kind, giveaway_id),
+            )
+            cur.copy_expert(query.decode("utf-8"), out)
+    finally:
+        conn.close()
@@ -0,0 +1,163 @@
+# giveaway_join_queue.py — пакетний запис участі в розіграшах
+"""
+На старті промо-розіграшу /api/join_giveaway отримує сплеск запитів.
+Замість окремого INSERT + з'єднання на кожен — запити кладуться в чергу,
+фоновий потік збирає їх протягом BATCH_WINDOW_MS (або до BATCH_MAX_SIZE)
+і пише одним multi-row INSERT через gdb.add_giveaway_players.
+
+Кожен виклик join() чекає свій результат і отримує точну відповідь:
+True — участь додано зараз, False — вже брав участь.
+Якщо пачка впала через один поганий рядок (FK, некоректні дані) —
+рядки пишуться по одному, і помилку отримує лише винний.
+
+Черга обмежена (QUEUE_MAX_SIZE): якщо вона повна довше за
+SUBMIT_TIMEOUT_SEC — JoinQueueFull, API відповідає 503 і клієнт повторює.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import psycopg2
+
+import giveaway_db_from_admin as gdb
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_WINDOW_MS = 5
+BATCH_MAX_SIZE = 500
+QUEUE_MAX_SIZE = 10_000
+SUBMIT_TIMEOUT_SEC = 0.5
+RESULT_TIMEOUT_SEC = 10
+
+
+class JoinQueueFull(Exception):
+    pass
+
+
+class GiveawayJoinQueue:
+
+    def __init__(
+        self,
+        window_ms: int = BATCH_WINDOW_MS,
+        max_batch: int = BATCH_MAX_SIZE,
+        max_queue: int = QUEUE_MAX_SIZE,
+    ):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run,
+            name="giveaway-join-queue",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def join(
+        self,
+        giveaway_id: int,
+        user_id: int,
+        username_snapshot: str | None,
+        points_in_giveaway: int = 1,
+        kind: str = "normal",
+    ) -> bool:
+        """
+        Ставить участь у чергу і чекає, поки пачку буде записано.
+        Повертає True, якщо участь додано зараз, False — якщо вже була.
+        """
+        # невідомий kind не повинен зламати всю пачку
+        gdb._giveaway_table(kind)
+
+        entry = {
+            "kind": kind,
+            "giveaway_id": giveaway_id,
+            "user_id": user_id,
+            "username_snapshot": username_snapshot,
+            "points_in_giveaway": points_in_giveaway,
+        }
+        fut: Future = Future()
+        try:
+            self._queue.put((entry, fut), timeout=SUBMIT_TIMEOUT_SEC)
+        except queue.Full:
+            raise JoinQueueFull("join_queue_full")
+        return fut.result(timeout=RESULT_TIMEOUT_SEC)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_one_by_one(self, batch: list) -> None:
+        for entry, fut in batch:
+            try:
+                inserted = gdb.add_giveaway_players([entry])
+            except Exception as e:
+                logger.warning(
+                    "giveaway join %s/%s error: %s", entry["giveaway_id"], entry["user_id"], e
+                )
+                fut.set_exception(e)
+                continue
+            # дубль у пачці: другий уже не вставить і отримає False
+            key = (entry["kind"], entry["giveaway_id"], entry["user_id"])
+            fut.set_result(key in inserted)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                inserted = gdb.add_giveaway_players([entry for entry, _ in batch])
+            except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                # винен конкретний рядок (видалений розіграш тощо) — не валимо решту
+                logger.warning("giveaway join batch (%s) failed, retrying one by one: %s", len(batch), e)
+                self._write_one_by_one(batch)
+                continue
+            except Exception as e:
+                logger.exception("giveaway join batch (%s) error: %s", len(batch), e)
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            # однаковий (kind, giveaway_id, user_id) двічі в пачці:
+            # "додано" отримує лише перший
+            answered = set()
+            for entry, fut in batch:
+                key = (entry["kind"], entry["giveaway_id"], entry["user_id"])
+                fut.set_result(key in inserted and key not in answered)
+                answered.add(key)
+
+
+_join_queue: GiveawayJoinQueue | None = None
+_join_queue_lock = threading.Lock()
+
+
+def get_join_queue() -> GiveawayJoinQueue:
+    global _join_queue
+    with _join_queue_lock:
+        if _join_queue is None:
+            _join_queue = GiveawayJoinQueue()
+            _join_queue.start()
+        return _join_queue
+
+
+metrics.Gauge(
+    "giveaway_join_queue_depth",
+    "Giveaway joins waiting to be written",
+    lambda: _join_queue.qsize() if _join_queue is not None else None,
+)
@@ -0,0 +1,176 @@
+# giveaways_view.py — сторінки /giveaways для бота (кеш відрендерених сторінок)
+"""
+Активні розіграші й оголошення показуються сторінками по PAGE_SIZE карточок
+з кнопками ◀️ / ▶️ (callback_data "gw:<сторінка>").
+
+- усі сторінки рендеряться разом одним запитом gdb.get_cards_page
+  (лише потрібні поля, без дочірніх рядків) і лежать у пам'яті,
+  тож гортання не ходить у БД
+- watch_feed() раз на FEED_POLL_SEC перевіряє gdb.get_feed_delta:
+  якщо щось створили / змінили / стартувало / закінчилось — кеш скидається,
+  наступний запит рендерить сторінки заново (перша, повна дельта одразу
+  наповнює кеш)
+- кожна сторінка гарантовано коротша за ліміт Telegram (4096 символів);
+  розмітка HTML, бо назви з "*" / "_" ламали Markdown
+"""
+
+import asyncio
+import html
+import logging
+import time
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+import giveaway_db_from_admin as gdb
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 8
+PAGE_MAX_CHARS = 3500     # із запасом до 4096
+TITLE_MAX_CHARS = 80
+PRIZE_MAX_CHARS = 80
+FEED_POLL_SEC = 30
+# страховка, якщо watch_feed не запущено або він падає
+PAGES_TTL_SEC = 600
+
+CALLBACK_PREFIX = "gw:"
+
+_FIELDS = {"title", "prize", "prize_count", "end_at"}
+
+_SECTIONS = {
+    "normal": "🎁 <b>Звичайні розіграші:</b>",
+    "promo": "📣 <b>Промо-розіграші каналів:</b>",
+    "announcement": "📌 <b>Оголошення:</b>",
+}
+
+
+def _escape(text) -> str:
+    return html.escape(str(text or ""), quote=False)
+
+
+def _truncate(text, limit: int) -> str:
+    text = str(text or "")
+    if len(text) > limit:
+        text = text[:limit - 1] + "…"
+    return text
+
+
+def _card_line(card: dict) -> str:
+    # обрізаємо до екранування, щоб рядок картки був обмежений
+    # і сторінка вкладалася в PAGE_MAX_CHARS
+    title = _truncate(card.get("title"), TITLE_MAX_CHARS)
+    line = f"- <code>#{card['id']}</code> {_escape(title)}"
+    if card["kind"] != "announcement":
+        prize = _truncate(card.get("prize"), PRIZE_MAX_CHARS)
+        line += f" — приз: <b>{_escape(prize)}</b> (до {card['prize_count']})"
+    return line + f", до {card['end_at']:%d.%m %H:%M}"
+
+
+def render_pages(cards: list[dict]) -> list[str]:
+    """
+    Карточки -> тексти сторінок (HTML), не довші за PAGE_MAX_CHARS.
+    """
+    cards = sorted(
+        cards,
+        key=lambda c: (gdb.CARD_KINDS.index(c["kind"]), c["end_at"], c["id"]),
+    )
+    if not cards:
+        return ["Зараз немає активних розіграшів і оголошень."]
+
+    pages: list[str] = []
+    lines: list[str] = []
+    size = 0
+    count = 0
+    kind = None
+
+    for card in cards:
+        item = []
+        if card["kind"] != kind or not lines:
+            if lines:
+                item.append("")
+            item.append(_SECTIONS[card["kind"]])
+        item.append(_card_line(card))
+        item_size = sum(len(s) + 1 for s in item)
+
+        if lines and (count >= PAGE_SIZE or size + item_size > PAGE_MAX_CHARS):
+            pages.append("\n".join(lines))
+            lines, size, count = [], 0, 0
+            item = [_SECTIONS[card["kind"]], _card_line(card)]
+            item_size = sum(len(s) + 1 for s in item)
+
+        lines.extend(item)
+        size += item_size
+        count += 1
+        kind = card["kind"]
+
+    pages.append("\n".join(lines))
+    return pages
+
+
+class GiveawaysView:
+
+    def __init__(self):
+        self._pages: list[str] | None = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._pages = None
+
+    def _set_pages(self, pages: list[str]) -> None:
+        self._pages = pages
+        self._loaded_at = time.monotonic()
+
+    async def _get_pages(self) -> list[str]:
+        pages = self._pages
+        if pages is not None and time.monotonic() - self._loaded_at < PAGES_TTL_SEC:
+            return pages
+
+        async with self._lock:
+            if self._pages is not None and time.monotonic() - self._loaded_at < PAGES_TTL_SEC:
+                return self._pages
+            result = await asyncio.to_thread(gdb.get_cards_page, fields=_FIELDS)
+            pages = render_pages(result["cards"])
+            self._set_pages(pages)
+            return pages
+
+    async def page(self, number: int) -> tuple[str, InlineKeyboardMarkup | None]:
+        """
+        Текст сторінки number (з 0) і клавіатура навігації.
+        Номер за межами — найближча існуюча сторінка.
+        """
+        pages = await self._get_pages()
+        number = max(0, min(number, len(pages) - 1))
+        text = pages[number]
+        if len(pages) == 1:
+            return text, None
+
+        text += f"\n\nСторінка {number + 1}/{len(pages)}"
+        buttons = []
+        if number > 0:
+            buttons.append(InlineKeyboardButton("◀️", callback_data=f"{CALLBACK_PREFIX}{number - 1}"))
+        if number < len(pages) - 1:
+            buttons.append(InlineKeyboardButton("▶️", callback_data=f"{CALLBACK_PREFIX}{number + 1}"))
+        return text, InlineKeyboardMarkup([buttons])
+
+    async def watch_feed(self, interval: float = FEED_POLL_SEC) -> None:
+        """
+        Фонова задача: скидає кеш сторінок, коли стрічка змінилась.
+        """
+        cursor = None
+        while True:
+            try:
+                # лише поля сторінок: нові участі (participants) кеш не скидають
+                delta = await asyncio.to_thread(gdb.get_feed_delta, cursor, fields=_FIELDS)
+                if delta["full"]:
+                    # повна стрічка вже є — рендеримо з неї, без окремого запиту
+                    self._set_pages(render_pages(delta["cards"]))
+                elif delta["cards"] or delta["removed"]:
+                    self.invalidate()
+                cursor = delta["cursor"]
+            except Exception as e:
+                logger.warning("giveaways feed watch error: %s", e)
+            await asyncio.sleep(interval)
+
+
+view = GiveawaysView()
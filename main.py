@@ -1,5 +1,6 @@
 # main.py — тільки Telegram-бот DreamX
 
+import asyncio
 import logging
 
 from telegram import (
@@ -8,15 +9,28 @@ from telegram import (
     KeyboardButton,
     ReplyKeyboardMarkup,
 )
+from telegram.error import BadRequest
 from telegram.ext import (
     ApplicationBuilder,
+    CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
 )
 
 import bd
+import bot_webhook
+import broadcast
 import giveaway_db_from_admin as gdb
-from config import BOT_TOKEN, WEBAPP_URL  # <-- беремо звідси
+import giveaways_view
+import metrics
+from config import (  # <-- беремо звідси
+    BOT_CONCURRENT_UPDATES,
+    BOT_MODE,
+    BOT_TOKEN,
+    TELEGRAM_API_URL,
+    WEBAPP_URL,
+    WEBHOOK_QUEUE_SIZE,
+)
 from one_vs_one_db import init_one_vs_one_tables
 
 logging.basicConfig(
@@ -36,13 +50,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     logger.info("Got /start from %s (%s)", user.id, user.username)
 
-    bd.ensure_user_pg(
+    points = bd.ensure_user_and_get_points(
         user_id=user.id,
         user_name=user.username,
         first_name=user.first_name
     )
-
-    points = bd.get_points_pg(user.id)
     url_with_points = f"{WEBAPP_URL}?user_id={user.id}&points={points}"
 
     keyboard = [[
@@ -68,7 +80,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def mypoints(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    points = bd.get_points_pg(user.id)
+    points = bd.ensure_user_and_get_points(user.id, user.username, user.first_name)
     await update.message.reply_text(f"У тебе зараз {points} балів 🔥")
 
 
@@ -106,62 +118,209 @@ async def pm_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-async def test_giveaways(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
-    giveaways = gdb.get_active_giveaways()
-    promo = gdb.get_active_promo_giveaways()
-    anns = gdb.get_active_announcements()
-
-    lines = [f"👋 Привіт, {user.first_name}!",
-             "Ось що зараз є в системі:\n"]
-
-    if giveaways:
-        lines.append("🎁 *Активні звичайні розіграші:*")
-        for g in giveaways:
-            lines.append(
-                f"- `#{g['id']}` {g['title']} — приз: *{g['prize']}* "
-                f"(до {g['prize_count']} переможців), "
-                f"до {g['end_at']:%d.%m %H:%M}"
-            )
-        lines.append("")
-    else:
-        lines.append("Немає активних звичайних розіграшів.\n")
-
-    if promo:
-        lines.append("📣 *Активні промо-розіграші каналів:*")
-        for p in promo:
-            lines.append(
-                f"- `#{p['id']}` {p['title']} — приз: *{p['prize']}* "
-                f"(до {p['prize_count']}), до {p['end_at']:%d.%m %H:%M}"
-            )
-        lines.append("")
-    else:
-        lines.append("Немає активних промо-розіграшів.\n")
-
-    if anns:
-        lines.append("📌 *Активні оголошення:*")
-        for a in anns:
-            lines.append(
-                f"- `#{a['id']}` {a['title']} (до {a['end_at']:%d.%m %H:%M})"
-            )
+    if user.id not in ADMIN_IDS:
+        await update.message.reply_text("У тебе немає прав використовувати цю команду.")
+        return
+
+    # беремо текст повністю, щоб зберегти переноси рядків
+    parts = (update.message.text or "").split(maxsplit=1)
+    if len(parts) < 2 or not parts[1].strip():
+        await update.message.reply_text(
+            "Формат:\n"
+            "/broadcast <повідомлення>\n\n"
+            "Повідомлення отримають усі гравці, які не заблокували бота.\n"
+            "Прогрес: /broadcast_status [id]"
+        )
+        return
+
+    broadcast_id = await asyncio.to_thread(
+        broadcast.create_broadcast, parts[1], user.id
+    )
+    await broadcast.start_broadcast(context.bot, broadcast_id)
+    await update.message.reply_text(
+        f"Розсилку #{broadcast_id} запущено 🚀\n"
+        f"Прогрес: /broadcast_status {broadcast_id}"
+    )
+
+
+async def broadcast_status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+
+    if user.id not in ADMIN_IDS:
+        await update.message.reply_text("У тебе немає прав використовувати цю команду.")
+        return
+
+    try:
+        broadcast_id = int(context.args[0]) if context.args else None
+    except ValueError:
+        await update.message.reply_text("id має бути числом.")
+        return
+
+    b = await asyncio.to_thread(broadcast.get_broadcast, broadcast_id)
+    if not b:
+        await update.message.reply_text("Розсилку не знайдено.")
+        return
+
+    await update.message.reply_text(
+        f"Розсилка #{b['id']}: {b['status']}\n"
+        f"Надіслано: {b['sent']}\n"
+        f"Помилок: {b['failed']}\n"
+        f"Заблокували бота: {b['blocked']}\n"
+        f"Останній user_id: {b['last_user_id']}"
+    )
+
+
+async def broadcast_resume_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+
+    if user.id not in ADMIN_IDS:
+        await update.message.reply_text("У тебе немає прав використовувати цю команду.")
+        return
+
+    try:
+        broadcast_id = int(context.args[0])
+    except (IndexError, ValueError):
+        await update.message.reply_text("Формат: /broadcast_resume <id>")
+        return
+
+    if await broadcast.start_broadcast(context.bot, broadcast_id):
+        await update.message.reply_text(f"Розсилку #{broadcast_id} продовжено ▶️")
     else:
-        lines.append("Немає активних оголошень.")
+        await update.message.reply_text(
+            "Розсилка вже йде, завершена або не знайдена."
+        )
+
+
+async def post_init(app):
+    # продовжуємо розсилки, перервані рестартом (у т.ч. коли оренда
+    # попереднього процесу ще не прострочилась — повторні перевірки)
+    asyncio.get_running_loop().create_task(broadcast.watch_running_broadcasts(app.bot))
+    # кеш сторінок /giveaways скидається, коли змінюється стрічка
+    asyncio.get_running_loop().create_task(giveaways_view.view.watch_feed())
+
+
+async def draw_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+
+    if user.id not in ADMIN_IDS:
+        await update.message.reply_text("У тебе немає прав використовувати цю команду.")
+        return
+
+    if len(context.args) < 2 or context.args[0] not in ("normal", "promo"):
+        await update.message.reply_text(
+            "Формат:\n"
+            "/draw <normal|promo> <giveaway_id> [weighted] [seed]\n\n"
+            "Приклад:\n"
+            "/draw normal 12 weighted"
+        )
+        return
 
-    text = "\n".join(lines)
-    await update.message.reply_text(text, parse_mode="Markdown")
+    kind = context.args[0]
+    rest = context.args[2:]
+    weighted = "weighted" in rest
+    seed_args = [a for a in rest if a != "weighted"]
+
+    try:
+        giveaway_id = int(context.args[1])
+        seed = int(seed_args[0]) if seed_args else None
+    except ValueError:
+        await update.message.reply_text("giveaway_id і seed мають бути числами.")
+        return
+
+    try:
+        draw = await asyncio.to_thread(
+            gdb.draw_giveaway_winners, kind, giveaway_id, weighted=weighted, seed=seed
+        )
+    except ValueError as e:
+        await update.message.reply_text(f"Не вдалося провести розіграш: {e}")
+        return
+
+    lines = [
+        f"🏆 Розіграш {kind} #{giveaway_id}",
+        f"Учасників: {draw['entrants']}, "
+        f"{'зважений' if draw['weighted'] else 'рівні шанси'}, seed: {draw['seed']}",
+        "",
+    ]
+    for w in draw["winners"]:
+        name = f"@{w['username_snapshot']}" if w["username_snapshot"] else ""
+        lines.append(f"{w['place']}. {w['user_id']} {name}".rstrip())
+    if not draw["winners"]:
+        lines.append("Немає учасників.")
+
+    await update.message.reply_text("\n".join(lines))
+
+
+async def giveaways_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text, keyboard = await giveaways_view.view.page(0)
+    await update.message.reply_text(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+async def giveaways_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    number = int(query.data[len(giveaways_view.CALLBACK_PREFIX):])
+    text, keyboard = await giveaways_view.view.page(number)
+    try:
+        await query.edit_message_text(text, parse_mode="HTML", reply_markup=keyboard)
+    except BadRequest as e:
+        # та сама сторінка (подвійний клік) — нічого не змінилось
+        if "not modified" not in str(e):
+            raise
+
+
+def build_application():
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .base_url(f"{TELEGRAM_API_URL}/bot")
+        .post_init(post_init)
+    )
+    if BOT_MODE == "webhook":
+        # апдейти приходять з aiohttp-сервера (bot_webhook), Updater не потрібен
+        builder = (
+            builder
+            .updater(None)
+            .update_queue(asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE))
+            .concurrent_updates(BOT_CONCURRENT_UPDATES)
+        )
+    app = builder.build()
+
+    commands = {
+        "start": start,
+        "mypoints": mypoints,
+        "pm": pm_command,
+        "giveaways": giveaways_command,
+        "test_giveaways": giveaways_command,
+        "draw": draw_command,
+        "broadcast": broadcast_command,
+        "broadcast_status": broadcast_status_command,
+        "broadcast_resume": broadcast_resume_command,
+    }
+    # кожен handler — з вимірюванням латентності для /metrics
+    for command, callback in commands.items():
+        app.add_handler(CommandHandler(command, metrics.timed_handler(command, callback)))
+    app.add_handler(CallbackQueryHandler(
+        metrics.timed_handler("giveaways_page", giveaways_page_callback),
+        pattern=r"^gw:\d+$",
+    ))
+    return app
 
 
 if __name__ == "__main__":
     bd.init_pg_db()
     init_one_vs_one_tables() 
+    gdb.init_giveaway_tables()
+    broadcast.init_broadcast_tables()
 
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    app = build_application()
 
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("mypoints", mypoints))
-    app.add_handler(CommandHandler("pm", pm_command))
-    app.add_handler(CommandHandler("test_giveaways", test_giveaways))
-
-    print("Bot is running (BOT ONLY)...")
-    app.run_polling()
+    if BOT_MODE == "webhook":
+        print("Bot is running (BOT ONLY, webhook)...")
+        asyncio.run(bot_webhook.run_webhook(app))
+    else:
+        print("Bot is running (BOT ONLY)...")
+        app.run_polling()
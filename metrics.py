@@ -0,0 +1,282 @@
+# metrics.py — метрики процесу у форматі Prometheus (/metrics)
+"""
+Counter / Histogram пишуть у shard поточного потоку (threading.local),
+тож на гарячому шляху немає спільного lock; render() зводить shards
+під час scrape. Gauge — функції, що викликаються лише під час scrape
+(розмір пулу, черги, кешів тощо).
+
+Усі метрики — з префіксом dreamx_.
+"""
+
+import bisect
+import functools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "dreamx_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class ThreadShards:
+    """
+    Окремий dict на кожен потік + зведення для читання.
+
+    merge(into, shard) додає shard до into. Shards завершених потоків
+    (ThreadingHTTPServer створює потік на з'єднання) зливаються в один
+    при читанні і кожні COMPACT_EVERY нових потоків.
+    """
+
+    COMPACT_EVERY = 256
+
+    def __init__(self, merge):
+        self._merge = merge
+        self._local = threading.local()
+        self._shards: list[tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def local(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) % self.COMPACT_EVERY == 0:
+                    self._compact()
+        return shard
+
+    def _compact(self) -> None:
+        # викликається під self._lock
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards[:] = alive
+
+    def collect(self) -> dict:
+        with self._lock:
+            self._compact()
+            merged: dict = {}
+            self._merge(merged, self._retired)
+            for _, shard in self._shards:
+                self._merge(merged, shard)
+        return merged
+
+
+def _merge_sums(into: dict, shard: dict) -> None:
+    for key, value in list(shard.items()):
+        into[key] = into.get(key, 0) + value
+
+
+def _merge_vectors(into: dict, shard: dict) -> None:
+    for key, values in list(shard.items()):
+        acc = into.get(key)
+        if acc is None:
+            into[key] = list(values)
+        else:
+            for i, v in enumerate(values):
+                acc[i] += v
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+_registry: list = []
+
+
+class Counter:
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = labels
+        self._shards = ThreadShards(_merge_sums)
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        shard = self._shards.local()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._shards.collect().items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_fmt(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._shards = ThreadShards(_merge_vectors)
+        _registry.append(self)
+
+    def observe(self, value: float, *labelvalues) -> None:
+        # [лічильник у кожному кошику (не кумулятивно)..., +Inf, sum]
+        shard = self._shards.local()
+        state = shard.get(labelvalues)
+        if state is None:
+            state = shard[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def time(self, *labelvalues):
+        """
+        with HIST.time("label"): ...
+        """
+        return _Timer(self, labelvalues)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, state in sorted(self._shards.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = 'le="' + _fmt(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_fmt(state[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+
+    def __init__(self, hist: Histogram, labelvalues: tuple):
+        self.hist = hist
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.started, *self.labelvalues)
+
+
+class Gauge:
+    """
+    Значення рахується під час scrape: fn() -> число
+    або {кортеж значень міток: число}.
+    """
+
+    def __init__(self, name: str, help: str, fn, labels: tuple = (), kind: str = "gauge"):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = labels
+        self.fn = fn
+        self.kind = kind
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        value = self.fn()
+        if value is None:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if isinstance(value, dict):
+            for key, v in sorted(value.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {_fmt(v)}")
+        else:
+            lines.append(f"{self.name} {_fmt(value)}")
+        return lines
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in list(_registry):
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            # одна зламана метрика (напр. БД недоступна) не ламає весь scrape
+            logger.warning("metric %s failed: %s", metric.name, e)
+    return "\n".join(lines) + "\n"
+
+
+# =========================
+#   КЕШІ
+# =========================
+
+_caches: dict[str, object] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """
+    LRUCache (hits / misses / len) для метрик dreamx_cache_*.
+    """
+    _caches[name] = cache
+
+
+def _cache_values(fn):
+    return lambda: {(name,): fn(cache) for name, cache in list(_caches.items())}
+
+
+def _hit_ratio(cache) -> float:
+    total = cache.hits + cache.misses
+    return cache.hits / total if total else 0.0
+
+
+Gauge("cache_hits_total", "Cache hits", _cache_values(lambda c: c.hits), ("cache",), kind="counter")
+Gauge("cache_misses_total", "Cache misses", _cache_values(lambda c: c.misses), ("cache",), kind="counter")
+Gauge("cache_hit_ratio", "Cache hit ratio since start", _cache_values(_hit_ratio), ("cache",))
+Gauge("cache_entries", "Entries in cache", _cache_values(len), ("cache",))
+
+
+# =========================
+#   HTTP API / БОТ
+# =========================
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP API requests", ("method", "route", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP API request latency", ("method", "route"),
+)
+BOT_HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds", "Bot handler latency", ("handler",),
+)
+BOT_HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Bot handler exceptions", ("handler",),
+)
+
+
+def timed_handler(name: str, callback):
+    """
+    Обгортка для PTB-callback: латентність і помилки по імені handler.
+    """
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            BOT_HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            BOT_HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+
+    return wrapper
@@ -2,6 +2,7 @@
 import os
 import psycopg2
 
+import db_pool
 from config import DATABASE_URL
 
 if not DATABASE_URL:
@@ -9,10 +10,7 @@ if not DATABASE_URL:
 
 
 def _get_conn():
-    return psycopg2.connect(
-        DATABASE_URL,
-        sslmode=os.getenv("PG_SSLMODE", "require")
-    )
+    return db_pool.connect()
 
 
 def init_one_vs_one_tables():
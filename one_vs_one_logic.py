@@ -5,6 +5,7 @@ from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+import db_pool
 from config import DATABASE_URL
 
 if not DATABASE_URL:
@@ -12,10 +13,7 @@ if not DATABASE_URL:
 
 
 def _get_conn():
-    return psycopg2.connect(
-        DATABASE_URL,
-        sslmode=os.getenv("PG_SSLMODE", "require")
-    )
+    return db_pool.connect()
 
 
 # ============================
@@ -471,3 +469,30 @@ def get_room_state(room_id: int, user_id: int | None = None):
 
     finally:
         conn.close()
+
+
+# ============================
+#   СТАТИСТИКА
+# ============================
+
+def get_room_counts() -> dict[str, int]:
+    """
+    Скільки кімнат чекають суперника ("waiting" — фактично черга)
+    і скільки зараз грають ("active").
+    """
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT status, COUNT(*)
+                FROM one_vs_one_rooms
+                WHERE status IN ('waiting', 'active')
+                GROUP BY status;
+                """
+            )
+            counts = {"waiting": 0, "active": 0}
+            counts.update(dict(cur.fetchall()))
+            return counts
+    finally:
+        conn.close()
@@ -0,0 +1,250 @@
+# profiling.py — профілювання CPU і пам'яті на вимогу (адмінські ендпоінти API)
+"""
+Вмикається PROFILING_ENABLED=1 (config); інакше ендпоінти відповідають 404,
+а на обробку запитів це не впливає (одна перевірка змінної).
+
+CPU, capture(seconds, mode):
+- "cprofile" — cProfile для кожного HTTP-запиту, що обробляється протягом
+  seconds; профілі зводяться в один pstats і віддаються відсортованими.
+  Запити, що не завершились до кінця вікна, у звіт не входять — звіт
+  каже, скільки їх було
+- "sample"   — окремий потік кожні SAMPLE_INTERVAL_SEC знімає стеки всіх
+  потоків (sys._current_frames), у т.ч. фонових (планувальник, черги);
+  результат — функції за кількістю семплів (self / total)
+
+Пам'ять (tracemalloc):
+- start  — вмикає tracemalloc і запам'ятовує базовий snapshot
+- diff   — новий snapshot, порівняння з попереднім (де пам'ять зросла),
+           новий стає базовим
+- stop   — вимикає tracemalloc (поки він увімкнений, алокації повільніші)
+
+Одночасно може йти лише одне CPU-профілювання.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from config import PROFILING_ENABLED
+
+ENABLED = PROFILING_ENABLED
+
+MAX_SECONDS = 60
+SAMPLE_INTERVAL_SEC = 0.005
+TRACEMALLOC_FRAMES = 10
+
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+# =========================
+#   CPU: cProfile запитів
+# =========================
+
+_capture_lock = threading.Lock()
+_profiles: list[cProfile.Profile] | None = None   # не None — йде захоплення
+_profiles_lock = threading.Lock()
+# номер поточного захоплення і лічильники запитів у ньому
+_generation = 0
+_started = 0
+_skipped = 0
+
+
+def request_profiler() -> cProfile.Profile | None:
+    """
+    Викликається на початку обробки запиту: Profile, якщо зараз іде
+    захоплення, інакше None (звичайний шлях — лише перевірка змінної).
+    """
+    global _started
+    if _profiles is None:
+        return None
+    with _profiles_lock:
+        if _profiles is None:
+            return None
+        _started += 1
+        profile = cProfile.Profile()
+        profile.generation = _generation
+    return profile
+
+
+def request_skipped(profile: cProfile.Profile) -> None:
+    """
+    profile.enable() не вдався (Python 3.12+: у процесі вже активний
+    інший профайлер) — запит обробляється без профілю, у звіті — окремо.
+    """
+    global _skipped
+    with _profiles_lock:
+        if _profiles is not None and profile.generation == _generation:
+            _skipped += 1
+
+
+def request_finished(profile: cProfile.Profile) -> None:
+    """
+    Запит оброблено (profile уже вимкнено в його потоці) — додаємо в звіт,
+    якщо те саме захоплення ще триває.
+    """
+    with _profiles_lock:
+        if _profiles is not None and profile.generation == _generation:
+            _profiles.append(profile)
+
+
+def _cprofile(seconds: float, sort: str, limit: int) -> str:
+    global _profiles, _generation, _started, _skipped
+    with _profiles_lock:
+        _generation += 1
+        _started = 0
+        _skipped = 0
+        _profiles = []
+    try:
+        time.sleep(seconds)
+    finally:
+        with _profiles_lock:
+            profiles, _profiles = _profiles, None
+            started, skipped = _started, _skipped
+
+    notes = []
+    in_flight = started - skipped - len(profiles)
+    if in_flight:
+        notes.append(f"{in_flight} requests still running at the end of the window (not included)")
+    if skipped:
+        notes.append(f"{skipped} requests not profiled (another profiler was active)")
+    notes = "".join(f"{note}\n" for note in notes)
+
+    if not profiles:
+        return f"no requests finished in {seconds:g}s\n" + notes
+
+    out = io.StringIO()
+    stats = pstats.Stats(profiles[0], stream=out)
+    for profile in profiles[1:]:
+        stats.add(profile)
+    out.write(f"{len(profiles)} requests in {seconds:g}s\n{notes}\n")
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+# =========================
+#   CPU: семплювання стеків
+# =========================
+
+def _frame_key(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno}({code.co_name})"
+
+
+def _sample(seconds: float, limit: int) -> str:
+    own = {threading.get_ident()}
+    total: Counter = Counter()
+    self_time: Counter = Counter()
+    samples = 0
+
+    def run():
+        nonlocal samples
+        own.add(threading.get_ident())
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident in own:
+                    continue
+                samples += 1
+                self_time[_frame_key(frame)] += 1
+                seen = set()
+                while frame is not None:
+                    key = _frame_key(frame)
+                    if key not in seen:
+                        seen.add(key)
+                        total[key] += 1
+                    frame = frame.f_back
+            time.sleep(SAMPLE_INTERVAL_SEC)
+
+    sampler = threading.Thread(target=run, name="profiling-sampler", daemon=True)
+    sampler.start()
+    sampler.join()
+
+    lines = [f"{samples} stack samples in {seconds:g}s (every {SAMPLE_INTERVAL_SEC * 1000:g} ms)", ""]
+    lines.append(f"{'total':>8} {'self':>8}  function")
+    for key, count in total.most_common(limit):
+        lines.append(f"{count:>8} {self_time.get(key, 0):>8}  {key}")
+    return "\n".join(lines) + "\n"
+
+
+def capture(seconds: float, mode: str = "cprofile", sort: str = "cumulative", limit: int = 50) -> str:
+    """
+    Профілює seconds секунд і повертає текстовий звіт.
+    ValueError — некоректні параметри, ProfilerBusy — вже йде інше профілювання.
+    """
+    if mode not in ("cprofile", "sample"):
+        raise ValueError("bad_mode")
+    if sort not in SORT_KEYS:
+        raise ValueError("bad_sort")
+    if not 0 < seconds <= MAX_SECONDS:
+        raise ValueError("bad_seconds")
+
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusy("profiler_busy")
+    try:
+        if mode == "sample":
+            return _sample(seconds, limit)
+        return _cprofile(seconds, sort, limit)
+    finally:
+        _capture_lock.release()
+
+
+# =========================
+#   ПАМ'ЯТЬ: tracemalloc
+# =========================
+
+_baseline: tracemalloc.Snapshot | None = None
+_tracemalloc_lock = threading.Lock()
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    # без алокацій самого tracemalloc / імпортів
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+def tracemalloc_action(action: str, limit: int = 30) -> str:
+    """
+    start / diff / stop; повертає текстовий звіт.
+    """
+    global _baseline
+    with _tracemalloc_lock:
+        if action == "start":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            _baseline = _snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            return f"tracemalloc started, traced {current / 1024:.0f} KiB (peak {peak / 1024:.0f} KiB)\n"
+
+        if action == "diff":
+            if not tracemalloc.is_tracing() or _baseline is None:
+                raise ValueError("tracemalloc_not_started")
+            snapshot = _snapshot()
+            diff = snapshot.compare_to(_baseline, "lineno")
+            _baseline = snapshot
+            current, peak = tracemalloc.get_traced_memory()
+            lines = [
+                f"traced {current / 1024:.0f} KiB (peak {peak / 1024:.0f} KiB)",
+                "growth since previous snapshot:",
+                "",
+            ]
+            lines.extend(str(stat) for stat in diff[:limit])
+            return "\n".join(lines) + "\n"
+
+        if action == "stop":
+            _baseline = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            return "tracemalloc stopped\n"
+
+    raise ValueError("bad_action")
@@ -0,0 +1,93 @@
+# rate_limit.py — token bucket для обмеження частоти викликів
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Класичний token bucket: rate токенів за секунду, не більше burst у запасі.
+    Потокобезпечний.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1) -> None:
+        """
+        Блокує потік, поки не з'являться токени.
+        """
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class KeyedRateLimiter:
+    """
+    Окремий token bucket на кожен ключ (user_id, IP, ...) з обмеженою пам'яттю.
+
+    - стан ключа — [tokens, updated, expires_at]; ключ, що простояв довше
+      за час повного наповнення, нічим не відрізняється від нового, тож
+      видаляється (expires_at)
+    - ключі розкладені по stripes окремих OrderedDict зі своїм lock
+      (менше конкуренції між потоками); у кожному — не більше
+      max_keys / stripes, далі витісняються найдавніше використані
+    """
+
+    def __init__(self, max_keys: int = 200_000, stripes: int = 16):
+        self._stripes = [(OrderedDict(), threading.Lock()) for _ in range(stripes)]
+        self._max_per_stripe = max(1, max_keys // stripes)
+
+    def try_acquire(self, key, rate: float, burst: float, tokens: float = 1) -> float:
+        """
+        0 — дозволено; інакше скільки секунд чекати до наступного токена.
+        """
+        data, lock = self._stripes[hash(key) % len(self._stripes)]
+        now = time.monotonic()
+        with lock:
+            state = data.get(key)
+            if state is None or state[2] <= now:
+                state = [burst, now, 0.0]
+                data[key] = state
+            else:
+                state[0] = min(burst, state[0] + (now - state[1]) * rate)
+                state[1] = now
+                data.move_to_end(key)
+
+            allowed = state[0] >= tokens
+            if allowed:
+                state[0] -= tokens
+            state[2] = now + (burst - state[0]) / rate
+
+            # прибираємо протухлі й зайві з початку (найдавніше використані)
+            while data:
+                oldest_key, oldest = next(iter(data.items()))
+                if oldest[2] > now and len(data) <= self._max_per_stripe:
+                    break
+                del data[oldest_key]
+
+            return 0.0 if allowed else (tokens - state[0]) / rate
+
+    def __len__(self) -> int:
+        return sum(len(data) for data, _ in self._stripes)
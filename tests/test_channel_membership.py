@@ -0,0 +1,140 @@
+# Перевірка підписки через локальний фейковий Bot API (без мережі і БД)
+
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# giveaway_db_from_admin вимагає DATABASE_URL при імпорті; з'єднань тест не відкриває
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/test")
+
+import channel_membership as cm  # noqa: E402
+
+TOKEN = "TEST:TOKEN"
+PROMO_ID = 1
+
+
+class FakeBotAPI(BaseHTTPRequestHandler):
+    """
+    getChatMember: статуси з server.members[(chat_id, user_id)];
+    server.private — канали, де бот не адмін; server.flood_wait — 429.
+    """
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        self.server.calls += 1
+
+        if parsed.path != f"/bot{TOKEN}/getChatMember":
+            return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+        chat_id, user_id = params["chat_id"], int(params["user_id"])
+        if self.server.flood_wait:
+            return self._reply(429, {
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 7",
+                "parameters": {"retry_after": self.server.flood_wait},
+            })
+        if chat_id in self.server.private:
+            return self._reply(400, {
+                "ok": False,
+                "error_code": 400,
+                "description": "Bad Request: member list is inaccessible",
+            })
+
+        status = self.server.members.get((chat_id, user_id), "left")
+        self._reply(200, {"ok": True, "result": {"status": status}})
+
+    def _reply(self, code, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MembershipVerifierTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotAPI)
+        self.server.calls = 0
+        self.server.members = {}
+        self.server.private = set()
+        self.server.flood_wait = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        transport = cm.TelegramHTTPTransport(
+            token=TOKEN,
+            base_url=f"http://127.0.0.1:{self.server.server_address[1]}",
+            timeout=2,
+        )
+        self.verifier = cm.MembershipVerifier(transport=transport, calls_per_sec=1000)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _promo_channels(self, *links):
+        # замість promo_giveaway_channels у БД
+        self.verifier._channels.set(PROMO_ID, list(links))
+
+    def test_member_is_cached(self):
+        self.server.members[("@news", 42)] = "member"
+        self._promo_channels("https://t.me/news")
+
+        self.assertEqual(self.verifier.missing_channels(PROMO_ID, 42), [])
+        self.assertEqual(self.verifier.missing_channels(PROMO_ID, 42), [])
+        self.assertEqual(self.server.calls, 1)
+
+    def test_non_member(self):
+        self.server.members[("@news", 42)] = "member"
+        self._promo_channels("https://t.me/news", "@other")
+
+        self.assertEqual(self.verifier.missing_channels(PROMO_ID, 42), ["@other"])
+
+    def test_private_channel_does_not_block(self):
+        self.server.private.add("@closed")
+        self._promo_channels("https://t.me/+invitehash", "@closed")
+
+        self.assertEqual(self.verifier.missing_channels(PROMO_ID, 42), [])
+        # інвайт-посилання навіть не запитується
+        self.assertEqual(self.server.calls, 1)
+
+    def test_flood_wait_fails_closed(self):
+        self.server.flood_wait = 7
+        self._promo_channels("@news")
+
+        with self.assertRaises(cm.MembershipCheckUnavailable) as ctx:
+            self.verifier.missing_channels(PROMO_ID, 42)
+        self.assertEqual(ctx.exception.retry_after, 7)
+
+        # поки триває пауза — Telegram не смикаємо і результат не кешуємо
+        with self.assertRaises(cm.MembershipCheckUnavailable):
+            self.verifier.missing_channels(PROMO_ID, 43)
+        self.assertEqual(self.server.calls, 1)
+
+    def test_slow_lookup_times_out(self):
+        def slow_transport(chat_id, user_id):
+            time.sleep(0.5)
+            return {"status": "member"}
+
+        verifier = cm.MembershipVerifier(transport=slow_transport, calls_per_sec=1000)
+        verifier._channels.set(PROMO_ID, ["@news"])
+
+        with self.assertRaises(cm.MembershipCheckUnavailable) as ctx:
+            verifier.missing_channels(PROMO_ID, 42, timeout=0.05)
+        self.assertEqual(str(ctx.exception), "membership_check_busy")
+
+
+if __name__ == "__main__":
+    unittest.main()
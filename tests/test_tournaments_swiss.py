@@ -0,0 +1,95 @@
+# Жеребкування швейцарки: чиста логіка, без БД
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tournaments_swiss import swiss_pairings, swiss_round_count  # noqa: E402
+
+
+def _play_round(pairs, bye, scores, history, had_bye):
+    # виграє перший у парі — для жеребкування важливі лише очки й історія
+    for a, b in pairs:
+        history.setdefault(a, set()).add(b)
+        history.setdefault(b, set()).add(a)
+        scores[a] = scores.get(a, 0) + 1
+    if bye is not None:
+        had_bye.add(bye)
+        scores[bye] = scores.get(bye, 0) + 1
+
+
+class SwissPairingsTest(unittest.TestCase):
+
+    def test_all_players_paired_once(self):
+        players = list(range(1, 9))
+        pairs, bye = swiss_pairings(players, {}, {}, set(), rng=random.Random(1))
+
+        self.assertIsNone(bye)
+        self.assertEqual(len(pairs), 4)
+        self.assertEqual(sorted(p for pair in pairs for p in pair), players)
+
+    def test_no_repeat_opponents(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            players = list(range(1, 9))
+            scores, history, had_bye = {}, {}, set()
+
+            for _ in range(swiss_round_count(len(players))):
+                pairs, bye = swiss_pairings(players, scores, history, had_bye, rng=rng)
+                for a, b in pairs:
+                    self.assertNotIn(b, history.get(a, set()), f"seed={seed}")
+                _play_round(pairs, bye, scores, history, had_bye)
+
+    def test_bye_rotates(self):
+        players = [1, 2, 3, 4, 5]
+        scores, history, had_bye = {}, {}, set()
+        byes = []
+
+        for _ in range(len(players)):
+            pairs, bye = swiss_pairings(players, scores, history, had_bye, rng=random.Random(7))
+            self.assertIsNotNone(bye)
+            self.assertNotIn(bye, [p for pair in pairs for p in pair])
+            byes.append(bye)
+            # між собою граємо лише для очок — повтори тут не перевіряємо
+            _play_round(pairs, bye, scores, {}, had_bye)
+
+        self.assertEqual(sorted(byes), players)
+
+    def test_bye_goes_to_lowest_score(self):
+        players = [1, 2, 3]
+        pairs, bye = swiss_pairings(players, {1: 2, 2: 1, 3: 0}, {}, set())
+
+        self.assertEqual(bye, 3)
+        self.assertEqual(pairs, [(1, 2)])
+
+    def test_stuck_raises(self):
+        with self.assertRaises(ValueError) as ctx:
+            swiss_pairings([1, 2], {}, {1: {2}, 2: {1}}, set())
+        self.assertEqual(str(ctx.exception), "no_valid_pairing")
+
+    def test_stuck_resolved_by_swap(self):
+        # 1-2 і 3-4 вже грали; за рейтингом напрошуються ті самі пари
+        history = {1: {2}, 2: {1}, 3: {4}, 4: {3}}
+        pairs, _ = swiss_pairings([1, 2, 3, 4], {1: 3, 2: 2, 3: 1, 4: 0}, history, set())
+
+        self.assertEqual(len(pairs), 2)
+        for a, b in pairs:
+            self.assertNotIn(b, history[a])
+
+
+class SwissRoundCountTest(unittest.TestCase):
+
+    def test_values(self):
+        self.assertEqual(swiss_round_count(0), 1)
+        self.assertEqual(swiss_round_count(1), 1)
+        self.assertEqual(swiss_round_count(2), 1)
+        self.assertEqual(swiss_round_count(3), 2)
+        self.assertEqual(swiss_round_count(8), 3)
+        self.assertEqual(swiss_round_count(9), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
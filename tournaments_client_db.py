@@ -3,6 +3,7 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+import db_pool
 from config import DATABASE_URL   # той самий, що в bd.py / giveaway_db_from_admin.py
 
 
@@ -11,7 +12,7 @@ if not DATABASE_URL:
 
 
 def _get_conn():
-    return psycopg2.connect(DATABASE_URL, sslmode=os.getenv("PG_SSLMODE", "require"))
+    return db_pool.connect()
 
 
 def get_upcoming_tournaments(limit: int = 20):
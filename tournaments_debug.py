@@ -1,13 +1,12 @@
 # tournaments_debug.py
 import bd
+import db_pool
 import tournaments_game_db as tgame
-import psycopg2
 from psycopg2.extras import RealDictCursor
-from config import DATABASE_URL
 
 
 def _get_conn():
-    return psycopg2.connect(DATABASE_URL, sslmode="require")
+    return db_pool.connect()
 
 
 def show(table, sql):
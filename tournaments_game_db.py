@@ -4,19 +4,18 @@ import random
 from datetime import datetime
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
-from config import DATABASE_URL
+import db_pool
+from config import DATABASE_URL, MATCH_MOVE_TIMEOUT_SEC
+from tournaments_swiss import swiss_pairings, swiss_round_count
 
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL not set")
 
 
 def _get_conn():
-    return psycopg2.connect(
-        DATABASE_URL,
-        sslmode=os.getenv("PG_SSLMODE", "require")
-    )
+    return db_pool.connect()
 
 
 # ------------------------
@@ -51,6 +50,122 @@ def _compute_result(m1: str, m2: str) -> str:
     return "p2_win"
 
 
+# ------------------------
+#   Таблиці
+# ------------------------
+
+def init_tournament_game_tables():
+    """
+    Створює допоміжні таблиці ігрової частини турнірів, якщо їх ще немає.
+
+    tournament_pending_matches — денормалізована черга незавершених матчів
+    кожного гравця. Рядок додається при створенні матчу і видаляється,
+    коли матч завершено. "Наступний матч" = точковий пошук по PK
+    (tournament_id, player_id), без OR по player1_id / player2_id.
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tournament_pending_matches (
+                    tournament_id        BIGINT NOT NULL,
+                    player_id            BIGINT NOT NULL,
+                    match_id             BIGINT NOT NULL,
+                    tournament_player_id BIGINT NOT NULL,
+                    PRIMARY KEY (tournament_id, player_id, match_id)
+                );
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS tournament_pending_matches_match_idx
+                ON tournament_pending_matches (match_id);
+                """
+            )
+
+            # дедлайн ходу в матчі (для автопоразки в планувальнику)
+            cur.execute(
+                """
+                ALTER TABLE matches
+                ADD COLUMN IF NOT EXISTS deadline_at TIMESTAMP;
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS matches_open_deadline_idx
+                ON matches (round_id, deadline_at)
+                WHERE status <> 'finished';
+                """
+            )
+
+            # режим жеребкування: 'groups' (кожен з кожним) або 'swiss'
+            cur.execute(
+                """
+                ALTER TABLE tournaments
+                ADD COLUMN IF NOT EXISTS pairing_mode TEXT NOT NULL DEFAULT 'groups';
+                """
+            )
+            # скільки раундів у swiss-турнірі; NULL — ceil(log2(гравців))
+            cur.execute(
+                """
+                ALTER TABLE tournaments
+                ADD COLUMN IF NOT EXISTS swiss_rounds INTEGER;
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE tournament_group_players
+                ADD COLUMN IF NOT EXISTS has_bye BOOLEAN NOT NULL DEFAULT FALSE;
+                """
+            )
+
+            # заповнюємо чергу для матчів, створених до появи таблиці
+            cur.execute(
+                """
+                INSERT INTO tournament_pending_matches
+                    (tournament_id, player_id, match_id, tournament_player_id)
+                SELECT m.tournament_id, tp.player_id, m.id, tp.id
+                FROM matches m
+                JOIN tournament_players tp
+                  ON tp.id IN (m.player1_id, m.player2_id)
+                WHERE m.status <> 'finished'
+                ON CONFLICT DO NOTHING;
+                """
+            )
+    finally:
+        conn.close()
+
+
+def _add_pending_match(cur, tournament_id: int, match_id: int, players) -> None:
+    """
+    Ставить матч у черги обох гравців.
+    players — пари (tournament_player_id, player_id).
+    Викликається всередині транзакції (cur).
+    """
+    for tp_id, player_id in players:
+        cur.execute(
+            """
+            INSERT INTO tournament_pending_matches
+                (tournament_id, player_id, match_id, tournament_player_id)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT DO NOTHING
+            """,
+            (tournament_id, player_id, match_id, tp_id),
+        )
+
+
+def _clear_pending_match(cur, match_id: int) -> None:
+    """
+    Прибирає завершений матч з черг гравців.
+    Викликається всередині транзакції (cur).
+    """
+    cur.execute(
+        "DELETE FROM tournament_pending_matches WHERE match_id = %s",
+        (match_id,),
+    )
+
+
 # ------------------------
 #   Гравці в турнірі
 # ------------------------
@@ -152,7 +267,7 @@ def create_group_round_from_active(tournament_id: int, round_number: int) -> int
             # 2) беремо всіх active-гравців турніру
             cur.execute(
                 """
-                SELECT id
+                SELECT id, player_id
                 FROM tournament_players
                 WHERE tournament_id = %s AND status = 'active'
                 ORDER BY id
@@ -161,6 +276,7 @@ def create_group_round_from_active(tournament_id: int, round_number: int) -> int
             )
             rows = cur.fetchall()
             tp_ids = [r["id"] for r in rows]
+            user_by_tp = {r["id"]: r["player_id"] for r in rows}
 
             if len(tp_ids) < 2:
                 raise ValueError("not_enough_players")
@@ -235,22 +351,236 @@ def create_group_round_from_active(tournament_id: int, round_number: int) -> int
                             """
                             INSERT INTO matches (
                                 tournament_id, round_id, group_id,
-                                player1_id, player2_id, status
+                                player1_id, player2_id, status, deadline_at
                             )
-                            VALUES (%s, %s, %s, %s, %s, 'pending')
+                            VALUES (%s, %s, %s, %s, %s, 'pending',
+                                    NOW() + make_interval(secs => %s))
+                            RETURNING id
                             """,
-                            (tournament_id, round_id, group_id, p1, p2),
+                            (tournament_id, round_id, group_id, p1, p2,
+                             MATCH_MOVE_TIMEOUT_SEC),
                         )
+                        match_id = cur.fetchone()["id"]
+                        _add_pending_match(
+                            cur,
+                            tournament_id,
+                            match_id,
+                            ((p1, user_by_tp[p1]), (p2, user_by_tp[p2])),
+                        )
+
+            return round_id
+    finally:
+        conn.close()
+
+
+# ------------------------
+#   Швейцарська система
+# ------------------------
+
+SWISS_BYE_SCORE = 3
+
+
+def create_swiss_round_from_active(tournament_id: int, round_number: int) -> int:
+    """
+    Створює раунд за швейцарською системою з усіх ACTIVE-гравців:
+    пари за сумою очок без повторних суперників, рівно n // 2 матчів,
+    непарному гравцю — bye (+SWISS_BYE_SCORE очок).
+    Весь раунд — одна група в tournament_groups.
+    Повертає round_id.
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT id
+                FROM tournament_rounds
+                WHERE tournament_id = %s AND round_number = %s
+                """,
+                (tournament_id, round_number),
+            )
+            existing = cur.fetchone()
+            if existing:
+                return existing["id"]
+
+            cur.execute(
+                """
+                SELECT id, player_id
+                FROM tournament_players
+                WHERE tournament_id = %s AND status = 'active'
+                """,
+                (tournament_id,),
+            )
+            rows = cur.fetchall()
+            if len(rows) < 2:
+                raise ValueError("not_enough_players")
+            user_by_tp = {r["id"]: r["player_id"] for r in rows}
+
+            # очки і bye за попередні раунди
+            cur.execute(
+                """
+                SELECT tournament_player_id AS tp_id,
+                       SUM(score) AS score,
+                       BOOL_OR(has_bye) AS had_bye
+                FROM tournament_group_players
+                WHERE tournament_id = %s
+                GROUP BY tournament_player_id
+                """,
+                (tournament_id,),
+            )
+            scores = {}
+            had_bye = set()
+            for r in cur.fetchall():
+                scores[r["tp_id"]] = r["score"]
+                if r["had_bye"]:
+                    had_bye.add(r["tp_id"])
+
+            # з ким уже грали
+            cur.execute(
+                """
+                SELECT player1_id, player2_id
+                FROM matches
+                WHERE tournament_id = %s
+                """,
+                (tournament_id,),
+            )
+            history: dict[int, set[int]] = {}
+            for r in cur.fetchall():
+                history.setdefault(r["player1_id"], set()).add(r["player2_id"])
+                history.setdefault(r["player2_id"], set()).add(r["player1_id"])
+
+            pairs, bye = swiss_pairings(list(user_by_tp), scores, history, had_bye)
+
+            cur.execute(
+                """
+                INSERT INTO tournament_rounds (tournament_id, round_number, type, status)
+                VALUES (%s, %s, 'swiss', 'running')
+                RETURNING id
+                """,
+                (tournament_id, round_number),
+            )
+            round_id = cur.fetchone()["id"]
+
+            cur.execute(
+                """
+                INSERT INTO tournament_groups (tournament_id, round_id, group_index, status, size)
+                VALUES (%s, %s, 1, 'running', %s)
+                RETURNING id
+                """,
+                (tournament_id, round_id, len(user_by_tp)),
+            )
+            group_id = cur.fetchone()["id"]
+
+            execute_values(
+                cur,
+                """
+                INSERT INTO tournament_group_players (
+                    tournament_id, round_id, group_id, tournament_player_id,
+                    score, is_qualified, has_bye
+                )
+                VALUES %s
+                """,
+                [
+                    (
+                        tournament_id, round_id, group_id, tp_id,
+                        SWISS_BYE_SCORE if tp_id == bye else 0,
+                        False,
+                        tp_id == bye,
+                    )
+                    for tp_id in user_by_tp
+                ],
+            )
+
+            if pairs:
+                created = execute_values(
+                    cur,
+                    """
+                    INSERT INTO matches (
+                        tournament_id, round_id, group_id,
+                        player1_id, player2_id, status, deadline_at
+                    )
+                    VALUES %s
+                    RETURNING id, player1_id, player2_id
+                    """,
+                    [
+                        (tournament_id, round_id, group_id, p1, p2, MATCH_MOVE_TIMEOUT_SEC)
+                        for p1, p2 in pairs
+                    ],
+                    template=(
+                        "(%s, %s, %s, %s, %s, 'pending', "
+                        "NOW() + make_interval(secs => %s))"
+                    ),
+                    fetch=True,
+                )
+
+                pending = []
+                for m in created:
+                    for tp_id in (m["player1_id"], m["player2_id"]):
+                        pending.append((tournament_id, user_by_tp[tp_id], m["id"], tp_id))
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO tournament_pending_matches
+                        (tournament_id, player_id, match_id, tournament_player_id)
+                    VALUES %s
+                    ON CONFLICT DO NOTHING
+                    """,
+                    pending,
+                )
 
             return round_id
     finally:
         conn.close()
 
 
+def build_round(tournament_id: int, round_number: int) -> int:
+    """
+    Створює раунд у режимі жеребкування турніру (tournaments.pairing_mode).
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT pairing_mode FROM tournaments WHERE id = %s",
+                (tournament_id,),
+            )
+            row = cur.fetchone()
+    finally:
+        conn.close()
+
+    if row and row[0] == "swiss":
+        return create_swiss_round_from_active(tournament_id, round_number)
+    return create_group_round_from_active(tournament_id, round_number)
+
+
 # ------------------------
 #   Отримати наступний матч гравця
 # ------------------------
 
+def get_pending_matches_for_player(tournament_id: int, player_id: int) -> list[dict]:
+    """
+    Повертає всі незавершені матчі гравця в турнірі (розклад), по id.
+    Читає чергу tournament_pending_matches по PK (tournament_id, player_id).
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT m.*
+                FROM tournament_pending_matches pm
+                JOIN matches m ON m.id = pm.match_id
+                WHERE pm.tournament_id = %s
+                  AND pm.player_id = %s
+                ORDER BY pm.match_id
+                """,
+                (tournament_id, player_id),
+            )
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
 def get_next_match_for_player(tournament_id: int, player_id: int) -> dict | None:
     """
     Повертає найближчий матч для гравця в цьому турнірі,
@@ -259,22 +589,19 @@ def get_next_match_for_player(tournament_id: int, player_id: int) -> dict | None
     conn = _get_conn()
     try:
         with conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-            tp_id = _get_tournament_player_id(cur, tournament_id, player_id)
-
             cur.execute(
                 """
-                SELECT *
-                FROM matches
-                WHERE tournament_id = %s
-                  AND (player1_id = %s OR player2_id = %s)
-                  AND status <> 'finished'
-                ORDER BY id
+                SELECT m.*
+                FROM tournament_pending_matches pm
+                JOIN matches m ON m.id = pm.match_id
+                WHERE pm.tournament_id = %s
+                  AND pm.player_id = %s
+                ORDER BY pm.match_id
                 LIMIT 1
                 """,
-                (tournament_id, tp_id, tp_id),
+                (tournament_id, player_id),
             )
-            match = cur.fetchone()
-            return match
+            return cur.fetchone()
     finally:
         conn.close()
 
@@ -283,6 +610,156 @@ def get_next_match_for_player(tournament_id: int, player_id: int) -> dict | None
 #   Зробити хід у матчі
 # ------------------------
 
+def _result_deltas(result: str) -> tuple[int, int]:
+    """
+    Очки в групі за результат матчу: (player1_delta, player2_delta).
+    win = 3, draw = 1, lose = 0.
+    """
+    if result == "draw":
+        return 1, 1
+    if result == "p1_win":
+        return 3, 0
+    return 0, 3  # p2_win
+
+
+def _apply_group_scores(cur, match: dict, p1_delta: int, p2_delta: int) -> None:
+    """
+    Додає очки обом гравцям матчу одним UPDATE.
+    Викликається всередині транзакції (cur).
+    """
+    cur.execute(
+        """
+        UPDATE tournament_group_players AS g
+        SET score = g.score + d.delta
+        FROM (VALUES (%s, %s), (%s, %s)) AS d (tp_id, delta)
+        WHERE g.tournament_id = %s
+          AND g.round_id = %s
+          AND g.group_id = %s
+          AND g.tournament_player_id = d.tp_id
+        """,
+        (
+            match["player1_id"], p1_delta,
+            match["player2_id"], p2_delta,
+            match["tournament_id"],
+            match["round_id"],
+            match["group_id"],
+        ),
+    )
+
+
+def _submit_move(cur, tournament_id: int, match_id: int, player_id: int, move: str) -> dict:
+    """
+    Хід гравця всередині транзакції (cur).
+
+    Запити: блокування матчу разом з пошуком tournament_players.id,
+    один UPDATE ходу з RETURNING і (якщо матч завершено) один UPDATE очок.
+    """
+    move = move.lower()
+    if move not in CHOICES:
+        raise ValueError("invalid_move")
+
+    # блокуємо матч і заразом визначаємо tournament_players.id
+    cur.execute(
+        """
+        SELECT m.*, tp.id AS tp_id
+        FROM matches m
+        LEFT JOIN tournament_players tp
+          ON tp.tournament_id = m.tournament_id
+         AND tp.player_id = %s
+        WHERE m.id = %s AND m.tournament_id = %s
+        FOR UPDATE OF m
+        """,
+        (player_id, match_id, tournament_id),
+    )
+    match = cur.fetchone()
+    if not match:
+        raise ValueError("match_not_found")
+
+    tp_id = match["tp_id"]
+    if tp_id is None:
+        raise ValueError("not_registered")
+
+    if match["status"] == "finished":
+        return {
+            "status": "already_finished",
+            "result": match["result"],
+            "player1_move": match["player1_move"],
+            "player2_move": match["player2_move"],
+        }
+
+    # визначаємо, який це гравець
+    if tp_id == match["player1_id"]:
+        col, other_col = "player1_move", "player2_move"
+    elif tp_id == match["player2_id"]:
+        col, other_col = "player2_move", "player1_move"
+    else:
+        raise ValueError("not_in_match")
+
+    # якщо хід уже був — нічого не робимо
+    if match[col] is not None:
+        # повернемо поточний стан
+        return {
+            "status": match["status"],
+            "player1_move": match["player1_move"],
+            "player2_move": match["player2_move"],
+            "result": match["result"],
+        }
+
+    if match[other_col] is None:
+        # чекаємо другого гравця
+        cur.execute(
+            f"""
+            UPDATE matches
+            SET {col} = %s,
+                status = 'waiting_for_moves'
+            WHERE id = %s
+            RETURNING player1_move, player2_move
+            """,
+            (move, match_id),
+        )
+        row = cur.fetchone()
+        return {
+            "status": "waiting_for_opponent",
+            "player1_move": row["player1_move"],
+            "player2_move": row["player2_move"],
+        }
+
+    # є обидва ходи -> рахуємо результат і закриваємо матч одним UPDATE
+    if col == "player1_move":
+        result = _compute_result(move, match[other_col])
+    else:
+        result = _compute_result(match[other_col], move)
+
+    cur.execute(
+        f"""
+        UPDATE matches
+        SET {col} = %s,
+            result = %s,
+            status = 'finished',
+            finished_at = NOW()
+        WHERE id = %s
+        RETURNING *
+        """,
+        (move, result, match_id),
+    )
+    match = cur.fetchone()
+    _clear_pending_match(cur, match_id)
+
+    # оновлюємо очки в групі
+    p1_delta, p2_delta = _result_deltas(result)
+    _apply_group_scores(cur, match, p1_delta, p2_delta)
+
+    return {
+        "status": "finished",
+        "round_id": match["round_id"],
+        "result": result,
+        "player1_move": match["player1_move"],
+        "player2_move": match["player2_move"],
+        "player1_delta": p1_delta,
+        "player2_delta": p2_delta,
+    }
+
+
 def submit_move(tournament_id: int, match_id: int, player_id: int, move: str) -> dict:
     """
     Записує хід гравця в матчі.
@@ -296,151 +773,331 @@ def submit_move(tournament_id: int, match_id: int, player_id: int, move: str) ->
     conn = _get_conn()
     try:
         with conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-            tp_id = _get_tournament_player_id(cur, tournament_id, player_id)
+            return _submit_move(cur, tournament_id, match_id, player_id, move)
+    finally:
+        conn.close()
+
+
+def submit_moves(tournament_id: int, player_id: int, moves: list[dict]) -> list[dict]:
+    """
+    Пачка ходів гравця ({match_id, move}) однією транзакцією.
+    Повертає результат для кожного елемента в тому ж порядку:
+      {"match_id": ..., "ok": True, "result": {...}}
+      {"match_id": ..., "ok": False, "error": "..."}
+    Логічні помилки (ValueError) стосуються лише свого елемента.
+    """
+    results: list[dict | None] = [None] * len(moves)
+
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # блокуємо матчі в порядку id, щоб паралельні пачки не ловили deadlock
+            order = sorted(range(len(moves)), key=lambda i: moves[i]["match_id"])
+            for i in order:
+                item = moves[i]
+                try:
+                    result = _submit_move(
+                        cur, tournament_id, item["match_id"], player_id, item["move"]
+                    )
+                    results[i] = {"match_id": item["match_id"], "ok": True, "result": result}
+                except ValueError as ve:
+                    results[i] = {"match_id": item["match_id"], "ok": False, "error": str(ve)}
+        return results
+    finally:
+        conn.close()
+
+
+# ------------------------
+#   Життєвий цикл (для планувальника)
+# ------------------------
+
+def get_scheduler_events() -> dict:
+    """
+    Все, що планувальнику треба поставити в таймер:
+      - "tournaments": заплановані турніри і секунди до start_dt
+      - "deadlines":   раунди з незавершеними матчами і секунди до
+                       найближчого дедлайну ходу
+      - "closable":    running-раунди, де всі матчі вже завершені
+      - "advanceable": останні (вже закриті) раунди running swiss-турнірів,
+                       для яких ще не збудовано наступний
+    Секунди рахує сама БД (NOW()), щоб не залежати від часу/таймзони сервера.
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT id,
+                       EXTRACT(EPOCH FROM (start_dt - NOW()))::float AS delay
+                FROM tournaments
+                WHERE status = 'scheduled'
+                  AND start_dt IS NOT NULL
+                """
+            )
+            tournaments = cur.fetchall()
 
-            # читаємо матч
             cur.execute(
                 """
-                SELECT *
+                SELECT round_id,
+                       EXTRACT(EPOCH FROM (MIN(deadline_at) - NOW()))::float AS delay
                 FROM matches
-                WHERE id = %s AND tournament_id = %s
-                FOR UPDATE
+                WHERE status <> 'finished'
+                  AND deadline_at IS NOT NULL
+                GROUP BY round_id
+                """
+            )
+            deadlines = cur.fetchall()
+
+            cur.execute(
+                """
+                SELECT r.id
+                FROM tournament_rounds r
+                WHERE r.status = 'running'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM matches m
+                      WHERE m.round_id = r.id AND m.status <> 'finished'
+                  )
+                """
+            )
+            closable = [r["id"] for r in cur.fetchall()]
+
+            cur.execute(
+                """
+                SELECT (
+                    SELECT r.id FROM tournament_rounds r
+                    WHERE r.tournament_id = t.id
+                    ORDER BY r.round_number DESC
+                    LIMIT 1
+                ) AS round_id
+                FROM tournaments t
+                WHERE t.status = 'running'
+                  AND t.pairing_mode = 'swiss'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM tournament_rounds r
+                      WHERE r.tournament_id = t.id AND r.status <> 'finished'
+                  )
+                """
+            )
+            advanceable = [r["round_id"] for r in cur.fetchall() if r["round_id"]]
+
+            return {
+                "tournaments": tournaments,
+                "deadlines": deadlines,
+                "closable": closable,
+                "advanceable": advanceable,
+            }
+    finally:
+        conn.close()
+
+
+def start_tournament(tournament_id: int) -> int | None:
+    """
+    Стартує запланований турнір: будує 1-й раунд і ставить status = 'running'.
+    Якщо гравців замало — турнір переходить у 'cancelled'.
+    Повертає round_id або None (турнір не знайдено / вже стартував / скасовано).
+    """
+    try:
+        round_id = build_round(tournament_id, round_number=1)
+        new_status = "running"
+    except ValueError as e:
+        if str(e) != "not_enough_players":
+            raise
+        round_id = None
+        new_status = "cancelled"
+
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE tournaments
+                SET status = %s
+                WHERE id = %s AND status = 'scheduled'
                 """,
-                (match_id, tournament_id),
-            )
-            match = cur.fetchone()
-            if not match:
-                raise ValueError("match_not_found")
-
-            if match["status"] == "finished":
-                return {
-                    "status": "already_finished",
-                    "result": match["result"],
-                    "player1_move": match["player1_move"],
-                    "player2_move": match["player2_move"],
-                }
-
-            # визначаємо, який це гравець
-            if tp_id == match["player1_id"]:
-                col = "player1_move"
-            elif tp_id == match["player2_id"]:
-                col = "player2_move"
-            else:
-                raise ValueError("not_in_match")
+                (new_status, tournament_id),
+            )
+        return round_id
+    finally:
+        conn.close()
 
-            # якщо хід уже був — нічого не робимо
-            if match[col] is not None:
-                # повернемо поточний стан
-                return {
-                    "status": match["status"],
-                    "player1_move": match["player1_move"],
-                    "player2_move": match["player2_move"],
-                    "result": match["result"],
-                }
 
-            # оновлюємо хід
+def finish_tournament(tournament_id: int) -> bool:
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
             cur.execute(
-                f"UPDATE matches SET {col} = %s WHERE id = %s",
-                (move, match_id),
+                """
+                UPDATE tournaments
+                SET status = 'finished'
+                WHERE id = %s AND status = 'running'
+                """,
+                (tournament_id,),
             )
+            return cur.rowcount > 0
+    finally:
+        conn.close()
 
-            # перечитуємо матч
+
+def advance_swiss_tournament(round_id: int) -> int | None:
+    """
+    Після закриття раунду swiss-турніру: будує раунд N+1 (пари за очками,
+    без повторів) або завершує турнір, якщо зіграно swiss_rounds раундів
+    чи активних гравців менше двох.
+    Повертає round_id нового раунду; None — турнір не swiss або завершено.
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT *
+                SELECT t.id, t.pairing_mode, t.swiss_rounds, r.round_number,
+                       (SELECT COUNT(*) FROM tournament_players tp
+                        WHERE tp.tournament_id = t.id AND tp.status = 'active')
+                FROM tournament_rounds r
+                JOIN tournaments t ON t.id = r.tournament_id
+                WHERE r.id = %s AND r.status = 'finished' AND t.status = 'running'
+                """,
+                (round_id,),
+            )
+            row = cur.fetchone()
+    finally:
+        conn.close()
+
+    if not row or row[1] != "swiss":
+        return None
+    tournament_id, _, rounds, round_number, active = row
+    if rounds is None:
+        rounds = swiss_round_count(active)
+    # більше n-1 раундів без повторних суперників не буває
+    rounds = min(rounds, max(1, active - 1))
+
+    if round_number < rounds and active > 1:
+        try:
+            return build_round(tournament_id, round_number + 1)
+        except ValueError as e:
+            # no_valid_pairing: кожен уже зіграв з усіма можливими
+            # суперниками — далі лише повтори, тож турнір закінчено
+            if str(e) not in ("not_enough_players", "no_valid_pairing"):
+                raise
+
+    finish_tournament(tournament_id)
+    return None
+
+
+def forfeit_expired_matches(round_id: int) -> int:
+    """
+    Закриває матчі раунду, де минув дедлайн ходу:
+      - походив лише один гравець -> він перемагає (p1_win / p2_win)
+      - не походив ніхто         -> result = 'forfeit', обом 0 очок
+    Все однією транзакцією, пачкою. Повертає кількість закритих матчів.
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT id, tournament_id, group_id,
+                       player1_id, player2_id, player1_move, player2_move
                 FROM matches
-                WHERE id = %s
+                WHERE round_id = %s
+                  AND status <> 'finished'
+                  AND deadline_at <= NOW()
+                FOR UPDATE SKIP LOCKED
                 """,
-                (match_id,),
+                (round_id,),
             )
-            match = cur.fetchone()
-            m1 = match["player1_move"]
-            m2 = match["player2_move"]
+            expired = cur.fetchall()
+            if not expired:
+                return 0
 
-            if not m1 or not m2:
-                # чекаємо другого гравця
-                cur.execute(
-                    """
-                    UPDATE matches
-                    SET status = 'waiting_for_moves'
-                    WHERE id = %s
-                    """,
-                    (match_id,),
-                )
-                return {
-                    "status": "waiting_for_opponent",
-                    "player1_move": m1,
-                    "player2_move": m2,
-                }
-
-            # є обидва ходи -> рахуємо результат
-            result = _compute_result(m1, m2)
-
-            if result == "draw":
-                p1_delta = 1
-                p2_delta = 1
-            elif result == "p1_win":
-                p1_delta = 3
-                p2_delta = 0
-            else:  # p2_win
-                p1_delta = 0
-                p2_delta = 3
-
-            # оновлюємо матч
-            cur.execute(
-                """
-                UPDATE matches
-                SET result = %s,
+            results = []
+            deltas: dict[int, int] = {}
+            for m in expired:
+                if m["player1_move"] and not m["player2_move"]:
+                    result = "p1_win"
+                    p1_delta, p2_delta = _result_deltas(result)
+                elif m["player2_move"] and not m["player1_move"]:
+                    result = "p2_win"
+                    p1_delta, p2_delta = _result_deltas(result)
+                else:
+                    result = "forfeit"
+                    p1_delta, p2_delta = 0, 0
+
+                results.append((m["id"], result))
+                for tp_id, delta in ((m["player1_id"], p1_delta), (m["player2_id"], p2_delta)):
+                    if delta:
+                        deltas[tp_id] = deltas.get(tp_id, 0) + delta
+
+            execute_values(
+                cur,
+                """
+                UPDATE matches AS m
+                SET result = d.result,
                     status = 'finished',
                     finished_at = NOW()
-                WHERE id = %s
+                FROM (VALUES %s) AS d (id, result)
+                WHERE m.id = d.id
                 """,
-                (result, match_id),
+                results,
             )
 
-            # оновлюємо очки в групі
+            match_ids = [mid for mid, _ in results]
+            cur.execute(
+                "DELETE FROM tournament_pending_matches WHERE match_id = ANY(%s)",
+                (match_ids,),
+            )
+
+            if deltas:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE tournament_group_players AS g
+                    SET score = g.score + d.delta
+                    FROM (VALUES %s) AS d (round_id, tp_id, delta)
+                    WHERE g.round_id = d.round_id
+                      AND g.tournament_player_id = d.tp_id
+                    """,
+                    [(round_id, tp_id, delta) for tp_id, delta in deltas.items()],
+                )
+
+            return len(results)
+    finally:
+        conn.close()
+
+
+def close_round_if_finished(round_id: int) -> bool:
+    """
+    Якщо всі матчі раунду завершені — ставить раунду та його групам
+    status = 'finished'. Повертає True, якщо раунд закрито саме зараз.
+    """
+    conn = _get_conn()
+    try:
+        with conn, conn.cursor() as cur:
             cur.execute(
                 """
-                UPDATE tournament_group_players
-                SET score = score + %s
-                WHERE tournament_id = %s
-                  AND round_id = %s
-                  AND group_id = %s
-                  AND tournament_player_id = %s
+                UPDATE tournament_rounds AS r
+                SET status = 'finished'
+                WHERE r.id = %s
+                  AND r.status <> 'finished'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM matches m
+                      WHERE m.round_id = r.id AND m.status <> 'finished'
+                  )
+                RETURNING r.id
                 """,
-                (
-                    p1_delta,
-                    match["tournament_id"],
-                    match["round_id"],
-                    match["group_id"],
-                    match["player1_id"],
-                ),
+                (round_id,),
             )
+            if not cur.fetchone():
+                return False
+
             cur.execute(
                 """
-                UPDATE tournament_group_players
-                SET score = score + %s
-                WHERE tournament_id = %s
-                  AND round_id = %s
-                  AND group_id = %s
-                  AND tournament_player_id = %s
+                UPDATE tournament_groups
+                SET status = 'finished'
+                WHERE round_id = %s
                 """,
-                (
-                    p2_delta,
-                    match["tournament_id"],
-                    match["round_id"],
-                    match["group_id"],
-                    match["player2_id"],
-                ),
+                (round_id,),
             )
-
-            return {
-                "status": "finished",
-                "result": result,
-                "player1_move": m1,
-                "player2_move": m2,
-                "player1_delta": p1_delta,
-                "player2_delta": p2_delta,
-            }
+            return True
     finally:
         conn.close()
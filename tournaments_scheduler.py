@@ -0,0 +1,250 @@
+# tournaments_scheduler.py — фоновий планувальник життєвого циклу турнірів
+"""
+Працює всередині api_server в окремому потоці.
+
+- стартує турніри в start_dt (будує 1-й раунд через tournaments_game_db)
+- по дедлайну ходу закриває матчі автопоразкою
+- закриває раунди, коли всі матчі завершені; у swiss-турнірі після цього
+  будує наступний раунд або завершує турнір
+
+Усі події лежать в одній купі (heapq) з часом спрацювання, потік спить
+до найближчої події — жодних запитів "кожну секунду". Раз на
+RESYNC_SEC стан перечитується з БД (нові турніри від адмінки тощо).
+
+Щоб при кількох інстансах API працював лише один планувальник,
+тримаємо Postgres advisory lock на окремому з'єднанні.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+import db_pool
+import tournaments_game_db as tgame
+
+logger = logging.getLogger(__name__)
+
+# ключ advisory lock (довільне стале число для цього планувальника)
+ADVISORY_LOCK_KEY = 7_310_028
+RESYNC_SEC = 60
+LOCK_RETRY_SEC = 30
+
+
+class TournamentScheduler:
+
+    def __init__(self, resync_sec: int = RESYNC_SEC, lock_retry_sec: int = LOCK_RETRY_SEC):
+        self.resync_sec = resync_sec
+        self.lock_retry_sec = lock_retry_sec
+
+        self._heap: list[tuple[float, int, str, int | None]] = []
+        self._due: dict[tuple[str, int | None], float] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        self._lock_conn = None
+        self._thread: threading.Thread | None = None
+        # stop() будить потік і з очікування подій, і з паузи між спробами lock
+        self._stop = threading.Event()
+
+    # ---------- таймер ----------
+
+    def schedule(self, delay: float, kind: str, key: int | None = None) -> None:
+        """
+        Ставить подію (kind, key) через delay секунд.
+        Якщо така подія вже стоїть раніше — нова ігнорується.
+        """
+        due = time.monotonic() + max(0.0, delay)
+        with self._cond:
+            current = self._due.get((kind, key))
+            if current is not None and current <= due:
+                return
+            self._due[(kind, key)] = due
+            heapq.heappush(self._heap, (due, next(self._seq), kind, key))
+            self._cond.notify()
+
+    def _pop_due(self) -> tuple[str, int | None] | None:
+        """
+        Чекає найближчу подію і повертає її (або None, якщо нас зупинили).
+        Застарілі записи (переплановані раніше) відкидаються ліниво.
+        """
+        with self._cond:
+            while not self._stop.is_set():
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                due, _, kind, key = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+
+                heapq.heappop(self._heap)
+                if self._due.get((kind, key)) != due:
+                    continue
+                del self._due[(kind, key)]
+                return kind, key
+        return None
+
+    def _clear(self) -> None:
+        with self._cond:
+            self._heap.clear()
+            self._due.clear()
+
+    # ---------- advisory lock ----------
+
+    def _try_acquire_lock(self) -> bool:
+        # окреме з'єднання поза пулом: advisory lock живе, поки живе сесія
+        conn = db_pool.direct_connection()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+                acquired = cur.fetchone()[0]
+        except Exception:
+            conn.close()
+            raise
+
+        if not acquired:
+            conn.close()
+            return False
+
+        self._lock_conn = conn
+        return True
+
+    def _lock_alive(self) -> bool:
+        try:
+            with self._lock_conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _release_lock(self) -> None:
+        if self._lock_conn is not None:
+            try:
+                self._lock_conn.close()
+            except Exception:
+                pass
+        self._lock_conn = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_conn is not None
+
+    # ---------- обробники подій ----------
+
+    def _resync(self) -> None:
+        if not self._lock_alive():
+            logger.warning("Tournament scheduler lost advisory lock connection")
+            self._release_lock()
+            self._clear()
+            return
+
+        events = tgame.get_scheduler_events()
+        for t in events["tournaments"]:
+            self.schedule(t["delay"], "start", t["id"])
+        for r in events["deadlines"]:
+            self.schedule(r["delay"], "deadline", r["round_id"])
+        for round_id in events["closable"]:
+            self.schedule(0, "close_round", round_id)
+        for round_id in events["advanceable"]:
+            self.schedule(0, "advance", round_id)
+
+        self.schedule(self.resync_sec, "resync")
+
+    def _handle(self, kind: str, key: int | None) -> None:
+        if kind == "resync":
+            self._resync()
+        elif kind == "start":
+            round_id = tgame.start_tournament(key)
+            logger.info("Tournament %s started, round_id=%s", key, round_id)
+            # підхопимо дедлайни нового раунду
+            self.schedule(0, "resync")
+        elif kind == "deadline":
+            closed = tgame.forfeit_expired_matches(key)
+            if closed:
+                logger.info("Round %s: %s matches closed by forfeit", key, closed)
+            self.schedule(0, "close_round", key)
+        elif kind == "close_round":
+            if tgame.close_round_if_finished(key):
+                logger.info("Round %s finished", key)
+                self.schedule(0, "advance", key)
+        elif kind == "advance":
+            next_round = tgame.advance_swiss_tournament(key)
+            if next_round is not None:
+                logger.info("Round %s finished, next swiss round_id=%s", key, next_round)
+                # підхопимо дедлайни нового раунду
+                self.schedule(0, "resync")
+
+    # ---------- потік ----------
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self.is_leader:
+                try:
+                    acquired = self._try_acquire_lock()
+                except Exception as e:
+                    logger.exception("Tournament scheduler lock error: %s", e)
+                    acquired = False
+
+                if not acquired:
+                    self._stop.wait(self.lock_retry_sec)
+                    continue
+
+                logger.info("Tournament scheduler is leader")
+                self.schedule(0, "resync")
+
+            event = self._pop_due()
+            if event is None:
+                break
+
+            kind, key = event
+            try:
+                self._handle(kind, key)
+            except Exception as e:
+                logger.exception("Tournament scheduler %s(%s) error: %s", kind, key, e)
+                if kind == "resync":
+                    self.schedule(self.resync_sec, "resync")
+
+        self._release_lock()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run,
+            name="tournament-scheduler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def notify_match_finished(self, round_id: int | None) -> None:
+        """
+        Матч завершено ходом гравця — перевіримо, чи не час закрити раунд.
+        Інстанс без lock нічого не робить: лідер закриє раунд по дедлайну
+        або при наступному resync.
+        """
+        if round_id and self.is_leader:
+            self.schedule(0, "close_round", round_id)
+
+
+_scheduler: TournamentScheduler | None = None
+
+
+def start_scheduler() -> TournamentScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = TournamentScheduler()
+        _scheduler.start()
+    return _scheduler
+
+
+def notify_match_finished(round_id: int | None) -> None:
+    if _scheduler is not None:
+        _scheduler.notify_match_finished(round_id)
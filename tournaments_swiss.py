@@ -0,0 +1,131 @@
+# tournaments_swiss.py — жеребкування раунду за швейцарською системою
+"""
+Чиста логіка в пам'яті, без БД.
+
+Гравці сортуються за сумою очок (всередині однакового рахунку — випадково),
+далі пари складаються зверху вниз: кожен бере найближчого за рейтингом
+суперника, з яким ще не грав. Так пари майже завжди формуються всередині
+одного "кошика" очок, а хто не знайшов пари — спускається в наступний.
+
+Якщо гравців непарна кількість — bye отримує найнижчий у рейтингу,
+хто ще не мав bye.
+"""
+
+import math
+import random
+
+
+def _pick_bye(order: list[int], had_bye: set[int]) -> int | None:
+    for p in reversed(order):
+        if p not in had_bye:
+            return p
+    # усі вже мали bye — віддаємо останньому
+    return order[-1] if order else None
+
+
+def _fix_stuck(stuck: list[int], pairs: list[tuple[int, int]], played) -> None:
+    """
+    Гравців, яким не знайшлося нового суперника, розводимо обміном
+    з уже складеними парами (з кінця — там найближчі за рейтингом).
+    """
+    while stuck:
+        a = stuck.pop()
+
+        # спершу — з іншим "застряглим"
+        for i in range(len(stuck) - 1, -1, -1):
+            b = stuck[i]
+            if b not in played(a):
+                pairs.append((a, b))
+                del stuck[i]
+                break
+        else:
+            if not stuck:
+                raise ValueError("no_valid_pairing")
+
+            b = stuck.pop()
+            # (c, d) + (a, b)  ->  (c, a) + (d, b)  або  (c, b) + (d, a)
+            for i in range(len(pairs) - 1, -1, -1):
+                c, d = pairs[i]
+                if a not in played(c) and b not in played(d):
+                    pairs[i] = (c, a)
+                    pairs.append((d, b))
+                    break
+                if b not in played(c) and a not in played(d):
+                    pairs[i] = (c, b)
+                    pairs.append((d, a))
+                    break
+            else:
+                raise ValueError("no_valid_pairing")
+
+
+def swiss_pairings(
+    players: list[int],
+    scores: dict[int, int],
+    history: dict[int, set[int]],
+    had_bye: set[int] | None = None,
+    rng: random.Random | None = None,
+) -> tuple[list[tuple[int, int]], int | None]:
+    """
+    players  — id гравців (tournament_players.id)
+    scores   — сума очок гравця за попередні раунди
+    history  — з ким гравець уже грав
+    had_bye  — хто вже отримував bye
+
+    Повертає (pairs, bye): рівно len(players) // 2 пар без повторних
+    суперників і id гравця з bye (або None).
+    Якщо повторів уникнути неможливо — ValueError("no_valid_pairing").
+    """
+    rng = rng or random
+    had_bye = had_bye or set()
+    empty: set[int] = set()
+
+    def played(p: int) -> set[int]:
+        return history.get(p, empty)
+
+    order = list(players)
+    rng.shuffle(order)
+    order.sort(key=lambda p: -scores.get(p, 0))  # sort стабільний
+
+    bye = None
+    if len(order) % 2:
+        bye = _pick_bye(order, had_bye)
+        order.remove(bye)
+
+    n = len(order)
+    taken = [False] * n
+    pairs: list[tuple[int, int]] = []
+    stuck: list[int] = []
+    first_free = 0
+
+    for i in range(n):
+        if taken[i]:
+            continue
+        taken[i] = True
+        a = order[i]
+        seen = played(a)
+
+        # найближчий вільний нижче за рейтингом, з ким ще не грали
+        while first_free < n and taken[first_free]:
+            first_free += 1
+        j = first_free
+        while j < n and (taken[j] or order[j] in seen):
+            j += 1
+
+        if j < n:
+            taken[j] = True
+            pairs.append((a, order[j]))
+        else:
+            stuck.append(a)
+
+    if stuck:
+        _fix_stuck(stuck, pairs, played)
+
+    return pairs, bye
+
+
+def swiss_round_count(players: int) -> int:
+    """
+    Скільки раундів грати, якщо в турнірі не задано: ceil(log2(n)) —
+    після стількох раундів лишається один гравець без поразок.
+    """
+    return max(1, math.ceil(math.log2(players))) if players > 1 else 1